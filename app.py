@@ -1,324 +1,1972 @@
+import gzip
+import hashlib
 import io
 import json
-from datetime import date, datetime, timedelta
-from typing import List, Dict, Tuple
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import date, timedelta
+from importlib.util import find_spec
+from pathlib import Path
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    TYPE_CHECKING,
+    Optional,
+    Tuple,
+)
 import numpy as np
 import pandas as pd
-import streamlit as st
-
-
-# --- CÁLCULO DE PÁSCOA ---
-def easter_sunday(year: int) -> date:
-    a = year % 19
-    b = year // 100
-    c = year % 100
-    d = b // 4
-    e = b % 4
-    f = (b + 8) // 25
-    g = (b - f + 1) // 3
-    h = (19 * a + b - d - g + 15) % 30
-    i = c // 4
-    k = c % 4
-    l = (32 + 2 * e + 2 * i - h - k) % 7
-    m = (a + 11 * h + 22 * l) // 451
-    n = (h + l - 7 * m + 114) // 31
-    o = (h + l - 7 * m + 114) % 31
-    return date(year, n, o + 1)
-
-
-# --- LÓGICA DE FERIADOS ---
-def get_holidays(year: int, config: dict) -> List[Dict]:
-    easter = easter_sunday(year)
-    hols = [
-        {"date": date(year, 1, 1), "holiday": "Confraternização Universal"},
-        {"date": date(year, 4, 21), "holiday": "Tiradentes"},
-        {"date": date(year, 5, 1), "holiday": "Dia do Trabalho"},
-        {"date": date(year, 9, 7), "holiday": "Independência do Brasil"},
-        {"date": date(year, 10, 12), "holiday": "Nossa Sra. Aparecida"},
-        {"date": date(year, 11, 2), "holiday": "Finados"},
-        {"date": date(year, 11, 15), "holiday": "Proclamação da República"},
-        {"date": date(year, 11, 20), "holiday": "Consciência Negra"},
-        {"date": date(year, 12, 25), "holiday": "Natal"},
-        {"date": easter - timedelta(days=2), "holiday": "Paixão de Cristo"},
-        {"date": easter, "holiday": "Domingo de Páscoa"},
-    ]
 
-    if config.get("incluir_carnaval"):
-        hols.append(
-            {"date": easter - timedelta(days=48), "holiday": "Carnaval (Segunda)"}
+# pyarrow, xlsxwriter, zstandard e streamlit são importados só quando usados
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Núcleo sem pandas: feriados, calendário e dias úteis (reexportados aqui)
+from core import (
+    ALL_COLUMNS,
+    BUSINESS_DAY_COLUMNS,
+    BUSINESS_DAY_EPOCH,
+    CALENDAR_COLUMNS,
+    DEFAULT_COLUMNS,
+    DIAS_PT,
+    DIAS_SEMANA_REGRA,
+    EXCEL_EPOCH_OFFSET,
+    HOLIDAY_FLAG_COLUMNS,
+    HOLIDAY_RULES,
+    HOLIDAY_RULES_FILE,
+    HOLIDAY_STATES,
+    HOLIDAY_TEXT_COLUMNS,
+    MESES_PT,
+    MUNICIPAL_RULES,
+    NATIONAL,
+    NATIONAL_RULES,
+    RULES_ENV,
+    STATE_RULES,
+    UF_SIGLAS,
+    HolidayRule,
+    Municipality,
+    RuleRegistry,
+    add_business_days,
+    business_day_columns,
+    business_days_between,
+    calendar_columns,
+    civil_from_days,
+    config_key,
+    easter_sunday,
+    easter_sundays,
+    get_holidays,
+    get_municipal_holidays,
+    get_state_holidays,
+    holiday_dates,
+    load_holiday_rules,
+)
+
+
+# --- INSTRUMENTAÇÃO (DESEMPENHO POR ETAPA) ---
+# CALENDARIO_PERFIL=1 mede tempo e memória; =tempo só o tempo (o tracemalloc
+# deixa a exportação várias vezes mais lenta)
+PROFILE_ENV = "CALENDARIO_PERFIL"
+PROFILE_TIME_ONLY = "tempo"
+
+
+class StageStats(NamedTuple):
+    name: str
+    seconds: float
+    rows: int
+    # Pico alocado na etapa; None sem tracemalloc ou se outra etapa (de outro
+    # perfil ou aninhada) mediu memória ao mesmo tempo
+    allocated_bytes: Optional[int]
+
+
+class Profile:
+    """Etapas medidas dentro de um bloco profiling().
+
+    Cada etapa zera o pico do tracemalloc ao começar, a não ser que outra etapa
+    esteja medindo memória no momento: aí nenhuma das duas informa a memória.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: List[StageStats] = []
+
+    def summary(self) -> List[StageStats]:
+        # Etapas repetidas (ex.: uma geração por bloco) somadas pelo nome;
+        # a memória fica com o maior pico
+        total: Dict[str, StageStats] = {}
+        for s in self.stages:
+            if s.name not in total:
+                total[s.name] = s
+                continue
+            t = total[s.name]
+            alocado = t.allocated_bytes
+            if s.allocated_bytes is not None:
+                alocado = max(alocado or 0, s.allocated_bytes)
+            total[s.name] = StageStats(
+                s.name, t.seconds + s.seconds, t.rows + s.rows, alocado
+            )
+        return list(total.values())
+
+    def report(self, **extra) -> Dict:
+        etapas = self.summary()
+        return {
+            "evento": "desempenho",
+            **extra,
+            "total_segundos": sum(s.seconds for s in etapas),
+            "etapas": [s._asdict() for s in etapas],
+        }
+
+    def log_line(self, **extra) -> str:
+        return json.dumps(self.report(**extra), ensure_ascii=False, default=str)
+
+
+_PROFILE: ContextVar[Optional[Profile]] = ContextVar("perfil", default=None)
+
+
+class _StageMemory:
+    __slots__ = ("antes", "sobreposta")
+
+    def __init__(self, antes: int):
+        self.antes = antes
+        self.sobreposta = False
+
+
+class _SharedTracer:
+    # O tracemalloc é um só no processo, mas os perfis podem ser vários (sessões
+    # do Streamlit, threads): a ativação é contada por referência e só o último
+    # perfil a sair o desliga. O pico só é zerado quando nenhuma outra etapa mede
+    # memória; etapas sobrepostas ficam sem memória em vez de com um pico alheio.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started = False
+        self._stages: set = set()
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            self._users += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            if self._users == 0 and self._started:
+                tracemalloc.stop()
+                self._started = False
+
+    def begin_stage(self) -> Optional[_StageMemory]:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return None
+            marcador = _StageMemory(tracemalloc.get_traced_memory()[0])
+            if self._stages:
+                marcador.sobreposta = True
+                for outra in self._stages:
+                    outra.sobreposta = True
+            else:
+                tracemalloc.reset_peak()
+            self._stages.add(marcador)
+            return marcador
+
+    def end_stage(self, marcador: _StageMemory) -> Optional[int]:
+        with self._lock:
+            self._stages.discard(marcador)
+            if marcador.sobreposta or not tracemalloc.is_tracing():
+                return None
+            return tracemalloc.get_traced_memory()[1] - marcador.antes
+
+
+_TRACER = _SharedTracer()
+
+
+def profile_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+@contextmanager
+def profiling(
+    enabled: Optional[bool] = None, trace_memory: Optional[bool] = None
+) -> Iterator[Optional[Profile]]:
+    # Liga a medição por etapas dentro do bloco (None segue CALENDARIO_PERFIL).
+    # Desligada, stage() devolve um contexto vazio e nada é medido.
+    if enabled is None:
+        enabled = profile_enabled()
+    if trace_memory is None:
+        trace_memory = os.environ.get(PROFILE_ENV) != PROFILE_TIME_ONLY
+    if not enabled:
+        yield None
+        return
+    perfil = Profile(trace_memory)
+    if trace_memory:
+        _TRACER.acquire()
+    token = _PROFILE.set(perfil)
+    try:
+        yield perfil
+    finally:
+        _PROFILE.reset(token)
+        if trace_memory:
+            _TRACER.release()
+
+
+def stage(name: str, rows: int = 0):
+    perfil = _PROFILE.get()
+    if perfil is None:
+        return nullcontext()
+    return _measure_stage(perfil, name, rows)
+
+
+@contextmanager
+def _measure_stage(perfil: Profile, name: str, rows: int) -> Iterator[None]:
+    memoria = _TRACER.begin_stage() if perfil.trace_memory else None
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        alocado = _TRACER.end_stage(memoria) if memoria is not None else None
+        perfil.stages.append(StageStats(name, segundos, rows, alocado))
+
+
+# Tipos compactos (opcionais) por coluna
+COMPACT_DTYPES = {
+    "Ano": "int16",
+    "Mes": "int8",
+    "DiaDoMes": "int8",
+    "DiaDoAno": "int16",
+    "DiaSemana": "int8",
+    "Trimestre": "int8",
+    "Semestre": "int8",
+    "SemanaAno": "int8",
+    "SemanaAnoISO": "int8",
+    "DataInt": "int32",
+    "DataEpoch": "int32",
+    "EhFimDeSemana": "boolean",
+    "EhFeriado": "boolean",
+    "NomeDiaSemana": pd.CategoricalDtype(list(DIAS_PT.values()), ordered=True),
+    "NomeMes": pd.CategoricalDtype(list(MESES_PT.values()), ordered=True),
+    "AnoMes": "category",
+    "Feriado": "category",
+    "Feriado Estadual": "category",
+    "Estado": "category",
+    "EhFeriadoNacional": "boolean",
+    "EhDiaUtil": "boolean",
+    "DiaUtilDoMes": "int8",
+    "DiaUtilDoAno": "int16",
+    "IndiceDiaUtil": "int32",
+    "QtdEstadosFeriado": "int8",
+    "UF": "category",
+    "Escopo": "category",
+}
+
+
+def bytes_per_row(df: pd.DataFrame) -> float:
+    if df.empty:
+        return 0.0
+    return float(df.memory_usage(deep=True, index=False).sum()) / len(df)
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    antes = bytes_per_row(df)
+    tipos = {c: t for c, t in COMPACT_DTYPES.items() if c in df.columns}
+    compacto = df.astype(tipos)
+    compacto.attrs["bytes_por_linha"] = {
+        "antes": antes,
+        "depois": bytes_per_row(compacto),
+    }
+    return compacto
+
+
+BRIDGE_COLUMNS = ["DataInt", "UF", "Feriado", "Escopo"]
+
+
+def _holiday_days(
+    start: date, end: date, config: dict, states: List[str]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Feriados dentro de [start, end] como dias desde 1970-01-01
+    datas, nomes, estados = holiday_dates(start.year, end.year, config, states)
+    dias = datas.astype(np.int64)
+    lo = np.datetime64(start, "D").astype(np.int64)
+    hi = np.datetime64(end, "D").astype(np.int64)
+    dentro = (dias >= lo) & (dias <= hi)
+    return dias[dentro], nomes[dentro], estados[dentro]
+
+
+def _holiday_flags(
+    dias: np.ndarray, start: date, end: date, config: dict, states: List[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    # EhFeriadoNacional e QtdEstadosFeriado por indexação direta (dias é contíguo)
+    n = len(dias)
+    eh_nacional = np.zeros(n, dtype=bool)
+    qtd_estados = np.zeros(n, dtype=np.int64)
+    if not n:
+        return eh_nacional, qtd_estados
+    fer_dias, _, fer_estados = _holiday_days(start, end, config, states)
+    offsets = fer_dias - dias[0]
+    nacional = pd.isna(fer_estados)
+    eh_nacional[offsets[nacional]] = True
+    if (~nacional).any():
+        codigos, uniques = pd.factorize(fer_estados[~nacional])
+        pares = np.unique(offsets[~nacional] * len(uniques) + codigos)
+        qtd_estados = np.bincount(pares // len(uniques), minlength=n).astype(np.int64)
+    return eh_nacional, qtd_estados
+
+
+def generate_holiday_bridge(
+    start: date, end: date, config: dict, states: List[str], compact: bool = False
+) -> pd.DataFrame:
+    # Tabela ponte normalizada: uma linha por (data, UF, feriado)
+    with stage("tabela_ponte", max((end - start).days + 1, 0)):
+        dias, nomes, estados = _holiday_days(start, end, config, states)
+        ano, mes, dia = civil_from_days(dias)
+        nacional = pd.isna(estados)
+        ufs = pd.Series(estados, dtype=object).map(UF_SIGLAS).to_numpy()
+        bridge = pd.DataFrame(
+            {
+                "DataInt": ano * 10000 + mes * 100 + dia,
+                "UF": np.where(nacional, "BR", ufs),
+                "Feriado": nomes,
+                "Escopo": np.where(nacional, "Nacional", "Estadual"),
+            }
         )
-        hols.append(
-            {"date": easter - timedelta(days=47), "holiday": "Carnaval (Terça)"}
+        bridge = (
+            bridge.sort_values("DataInt", kind="stable")
+            .drop_duplicates()
+            .reset_index(drop=True)
         )
-    if config.get("incluir_cinzas"):
-        hols.append(
-            {"date": easter - timedelta(days=46), "holiday": "Quarta-feira de Cinzas"}
+        return compact_dtypes(bridge) if compact else bridge
+
+
+# --- ARMAZÉM PRÉ-CALCULADO (ARROW MAPEADO EM MEMÓRIA) ---
+STORE_START = date(1900, 1, 1)
+STORE_END = date(2199, 12, 31)
+STORE_VERSION = 1
+STORE_ENV = "CALENDARIO_STORE"
+_STORE_CALENDAR_FILE = "calendario.arrow"
+_STORE_MASKS_FILE = "feriados.arrow"
+_NATIONAL_MASK = "BR"
+
+
+class CalendarStore(NamedTuple):
+    first_day: int  # dias desde 1970-01-01 da primeira linha
+    last_day: int
+    calendar: "pa.Table"
+    masks: "pa.Table"
+
+
+_STORE: Optional[CalendarStore] = None
+
+
+def _rules_fingerprint() -> str:
+    # Muda sempre que as regras de feriados mudam: um armazém antigo é recusado
+    regras = repr((NATIONAL_RULES, sorted(STATE_RULES.items())))
+    return hashlib.sha256(regras.encode("utf-8")).hexdigest()
+
+
+def _holiday_masks(dias: np.ndarray, start: date, end: date) -> Dict[str, np.ndarray]:
+    # Uma máscara por grupo: nacionais fixos, cada opção incluir_* e cada Estado
+    def mascara(config=None, states=None, include_national=True):
+        datas, _, _ = holiday_dates(
+            start.year, end.year, config, states, include_national=include_national
         )
-    if config.get("incluir_corpus"):
-        hols.append({"date": easter + timedelta(days=60), "holiday": "Corpus Christi"})
-    if config.get("incluir_vespera_natal"):
-        hols.append({"date": date(year, 12, 24), "holiday": "Véspera de Natal"})
-    if config.get("incluir_vespera_ano_novo"):
-        hols.append({"date": date(year, 12, 31), "holiday": "Véspera de Ano Novo"})
-
-    return hols
-
-
-def get_state_holidays(year: int, selected_states: List[str]) -> List[Dict]:
-    easter = easter_sunday(year)
-    state_data = {
-        "São Paulo": [
-            {"date": date(year, 7, 9), "holiday": "Revolução Constitucionalista"}
-        ],
-        "Rio de Janeiro": [
-            {"date": easter - timedelta(days=47), "holiday": "Carnaval (Feriado RJ)"},
-            {"date": date(year, 4, 23), "holiday": "Dia de São Jorge"},
-            {"date": date(year, 10, 20), "holiday": "Dia do Comerciário"},
-        ],
-        "Minas Gerais": [{"date": date(year, 4, 21), "holiday": "Data Magna de MG"}],
-        "Rio Grande do Sul": [
-            {"date": date(year, 9, 20), "holiday": "Revolução Farroupilha"}
-        ],
-        "Bahia": [{"date": date(year, 7, 2), "holiday": "Independência da Bahia"}],
-        "Pernambuco": [
-            {"date": date(year, 3, 6), "holiday": "Data Magna de PE"},
-            {"date": date(year, 6, 24), "holiday": "Dia de São João"},
-        ],
-        "Pará": [{"date": date(year, 8, 15), "holiday": "Adesão do Grão-Pará"}],
-        "Amazonas": [
-            {"date": date(year, 9, 5), "holiday": "Elevação do AM"},
-            {"date": date(year, 12, 8), "holiday": "Nossa Sra. da Conceição"},
-        ],
-        "Ceará": [
-            {"date": date(year, 3, 19), "holiday": "Dia de São José"},
-            {"date": date(year, 3, 25), "holiday": "Data Magna do CE"},
-        ],
-        "Distrito Federal": [
-            {"date": date(year, 4, 21), "holiday": "Fundação de Brasília"},
-            {"date": date(year, 11, 30), "holiday": "Dia do Evangélico"},
-            {"date": easter + timedelta(days=60), "holiday": "Corpus Christi (DF)"},
-        ],
-        "Espírito Santo": [
-            {"date": easter + timedelta(days=8), "holiday": "Nossa Sra. da Penha"}
-        ],
-        "Maranhão": [{"date": date(year, 7, 28), "holiday": "Adesão do Maranhão"}],
-        "Mato Grosso do Sul": [
-            {"date": date(year, 10, 11), "holiday": "Criação do MS"}
-        ],
-        "Acre": [
-            {"date": date(year, 1, 20), "holiday": "Dia do Católico"},
-            {"date": date(year, 1, 25), "holiday": "Dia do Evangélico"},
-            {"date": date(year, 6, 15), "holiday": "Aniversário do AC"},
-            {"date": date(year, 9, 5), "holiday": "Dia da Amazônia"},
-            {"date": date(year, 11, 17), "holiday": "Tratado de Petrópolis"},
-        ],
-        "Sergipe": [{"date": date(year, 7, 8), "holiday": "Emancipação de Sergipe"}],
-        "Tocantins": [
-            {"date": date(year, 1, 1), "holiday": "Instalação de TO"},
-            {"date": date(year, 9, 8), "holiday": "Nossa Sra. da Natividade"},
-            {"date": date(year, 10, 5), "holiday": "Criação de TO"},
-        ],
-        "Rondônia": [
-            {"date": date(year, 1, 4), "holiday": "Criação de RO"},
-            {"date": date(year, 6, 18), "holiday": "Dia do Evangélico"},
-        ],
-        "Alagoas": [
-            {"date": date(year, 6, 24), "holiday": "Dia de São João"},
-            {"date": date(year, 6, 29), "holiday": "Dia de São Pedro"},
-            {"date": date(year, 9, 16), "holiday": "Emancipação de AL"},
-        ],
-        "Roraima": [{"date": date(year, 10, 5), "holiday": "Elevação de RR"}],
-        "Amapá": [
-            {"date": date(year, 3, 19), "holiday": "Dia de São José"},
-            {"date": date(year, 7, 25), "holiday": "Dia de São Tiago"},
-        ],
-        "Paraíba": [{"date": date(year, 8, 5), "holiday": "Fundação da Paraíba"}],
-        "Piauí": [
-            {"date": date(year, 3, 13), "holiday": "Batalha do Jenipapo"},
-            {"date": date(year, 10, 19), "holiday": "Dia do Piauí"},
-        ],
+        m = np.zeros(len(dias), dtype=bool)
+        offsets = datas.astype(np.int64) - dias[0]
+        m[offsets[(offsets >= 0) & (offsets < len(dias))]] = True
+        return m
+
+    opcoes = dict.fromkeys(r.config for r in NATIONAL_RULES if r.config)
+    masks = {_NATIONAL_MASK: mascara()}
+    masks.update({f"{_NATIONAL_MASK}:{k}": mascara({k: True}) for k in opcoes})
+    masks.update({s: mascara(states=[s], include_national=False) for s in STATE_RULES})
+    return masks
+
+
+def build_calendar_store(
+    path, start: date = STORE_START, end: date = STORE_END
+) -> Path:
+    # Gera uma vez; os arquivos IPC sem compressão podem ser mapeados direto
+    import pyarrow as pa
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    first = int(np.datetime64(start, "D").astype(np.int64))
+    last = int(np.datetime64(end, "D").astype(np.int64))
+    dias = np.arange(first, last + 1, dtype=np.int64)
+    meta = {
+        "versao": str(STORE_VERSION),
+        "inicio": start.isoformat(),
+        "fim": end.isoformat(),
+        "regras": _rules_fingerprint(),
+    }
+    calendario = {
+        # Nomes em dicionário: a fatia vira índices + poucos textos distintos
+        c: pa.array(v).dictionary_encode() if v.dtype == object else v
+        for c, v in calendar_columns(dias).items()
     }
+    for arquivo, colunas in (
+        (_STORE_CALENDAR_FILE, calendario),
+        (_STORE_MASKS_FILE, _holiday_masks(dias, start, end)),
+    ):
+        tabela = pa.table(colunas).replace_schema_metadata(meta)
+        with pa.OSFile(str(path / arquivo), "wb") as sink:
+            with pa.ipc.new_file(sink, tabela.schema) as writer:
+                writer.write_table(tabela, max_chunksize=len(dias))
+    return path
+
+
+def open_calendar_store(path) -> CalendarStore:
+    import pyarrow as pa
+
+    path = Path(path)
+    tabelas = []
+    for arquivo in (_STORE_CALENDAR_FILE, _STORE_MASKS_FILE):
+        tabela = pa.ipc.open_file(pa.memory_map(str(path / arquivo))).read_all()
+        meta = {k.decode(): v.decode() for k, v in tabela.schema.metadata.items()}
+        if meta.get("versao") != str(STORE_VERSION):
+            raise ValueError(f"Armazém em versão incompatível: {path}.")
+        if meta.get("regras") != _rules_fingerprint():
+            raise ValueError(f"Armazém desatualizado (regras de feriados): {path}.")
+        tabelas.append(tabela)
+    first = int(np.datetime64(meta["inicio"], "D").astype(np.int64))
+    last = int(np.datetime64(meta["fim"], "D").astype(np.int64))
+    return CalendarStore(first, last, *tabelas)
+
+
+def use_calendar_store(path=None) -> Optional[CalendarStore]:
+    # Ativa (ou, com None, desativa) o armazém usado por generate_date_dimension
+    global _STORE
+    _STORE = None if path is None else open_calendar_store(path)
+    return _STORE
+
 
-    state_hols = []
-    for state in selected_states:
-        if state in state_data:
-            for h in state_data[state]:
-                h_copy = h.copy()
-                h_copy["Estado"] = state
-                state_hols.append(h_copy)
-    return state_hols
+def _store_range(dias: np.ndarray) -> Optional[Tuple[CalendarStore, int]]:
+    store = _STORE
+    if store is None or not len(dias):
+        return None
+    if dias[0] < store.first_day or dias[-1] > store.last_day:
+        return None
+    return store, int(dias[0] - store.first_day)
+
+
+def _store_calendar_columns(
+    store: CalendarStore, i: int, n: int, columns: Optional[List[str]] = None
+) -> Dict[str, np.ndarray]:
+    import pyarrow as pa
+
+    wanted = CALENDAR_COLUMNS if columns is None else columns
+    fatia = store.calendar.slice(i, n)
+    colunas = {}
+    for c in CALENDAR_COLUMNS:
+        if c in wanted:
+            coluna = fatia.column(c).combine_chunks()
+            if pa.types.is_dictionary(coluna.type):
+                nomes = coluna.dictionary.to_numpy(zero_copy_only=False)
+                colunas[c] = nomes[coluna.indices.to_numpy()]
+            else:
+                colunas[c] = coluna.to_numpy(zero_copy_only=False)
+    return colunas
+
+
+def _store_holiday_flags(
+    store: CalendarStore, i: int, n: int, config: dict, states: List[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    fatia = store.masks.slice(i, n)
+    eh_nacional = fatia.column(_NATIONAL_MASK).to_numpy()
+    for k in config_key(config):
+        if f"{_NATIONAL_MASK}:{k}" in fatia.column_names:
+            eh_nacional = eh_nacional | fatia.column(f"{_NATIONAL_MASK}:{k}").to_numpy()
+    qtd_estados = np.zeros(n, dtype=np.int64)
+    for s in set(states):
+        if s in STATE_RULES:
+            qtd_estados += fatia.column(s).to_numpy()
+    return eh_nacional, qtd_estados
+
+
+def validate_calendar_store(path, rebuild: bool = True) -> List[str]:
+    # Reconstrói o armazém e compara com o cálculo ao vivo no intervalo inteiro
+    global _STORE
+    if rebuild:
+        build_calendar_store(path)
+    store = open_calendar_store(path)
+    start = date.fromisoformat(
+        store.calendar.schema.metadata[b"inicio"].decode("utf-8")
+    )
+    end = date.fromisoformat(store.calendar.schema.metadata[b"fim"].decode("utf-8"))
+    opcoes = {r.config: True for r in NATIONAL_RULES if r.config}
+    # Dias úteis só valem com no máximo um Estado: todos os Estados, sem eles
+    sem_uteis = [c for c in ALL_COLUMNS if c not in BUSINESS_DAY_COLUMNS]
+    casos = [({}, [], ALL_COLUMNS), (opcoes, list(STATE_RULES), sem_uteis)]
+    casos += [(opcoes, [estado], BUSINESS_DAY_COLUMNS) for estado in STATE_RULES]
+    problemas = []
+    anterior = _STORE
+    try:
+        for config, states, columns in casos:
+            _STORE = None
+            vivo = generate_date_dimension(start, end, config, states, columns=columns)
+            _STORE = store
+            mapeado = generate_date_dimension(
+                start, end, config, states, columns=columns
+            )
+            for c in vivo.columns:
+                if not vivo[c].equals(mapeado[c]):
+                    problemas.append(f"{c} difere (opções={sorted(config)}).")
+    finally:
+        _STORE = anterior
+    return problemas
+
+
+if os.environ.get(STORE_ENV):
+    import pyarrow as pa
+
+    try:
+        use_calendar_store(os.environ[STORE_ENV])
+    except (OSError, ValueError, pa.ArrowException) as exc:
+        warnings.warn(f"Armazém pré-calculado ignorado: {exc}")
+
+
+def check_business_day_states(columns: Iterable[str], states: List[str]) -> None:
+    # Dia útil depende do calendário de um Estado: com vários, nenhum valor serve
+    # para todos (um feriado da Bahia não para São Paulo)
+    if len(states) > 1 and any(c in BUSINESS_DAY_COLUMNS for c in columns):
+        raise ValueError(
+            "As colunas de dias úteis exigem no máximo um Estado: "
+            "gere uma tabela por Estado."
+        )
 
 
-# --- GERAÇÃO DO DATAFRAME ---
 def generate_date_dimension(
-    start: date, end: date, config: dict, states: List[str]
+    start: date,
+    end: date,
+    config: dict,
+    states: List[str],
+    compact: bool = False,
+    columns: Optional[List[str]] = None,
+    holiday_bridge: bool = False,
 ) -> pd.DataFrame:
-    # (O corpo desta função permanece exatamente o mesmo que você postou)
-    dates = pd.date_range(start=start, end=end, freq="D")
-    df = pd.DataFrame({"Data": dates})
-
-    dias_pt = {
-        1: "Domingo",
-        2: "Segunda-feira",
-        3: "Terça-feira",
-        4: "Quarta-feira",
-        5: "Quinta-feira",
-        6: "Sexta-feira",
-        7: "Sábado",
-    }
-    meses_pt = {
-        1: "Janeiro",
-        2: "Fevereiro",
-        3: "Março",
-        4: "Abril",
-        5: "Maio",
-        6: "Junho",
-        7: "Julho",
-        8: "Agosto",
-        9: "Setembro",
-        10: "Outubro",
-        11: "Novembro",
-        12: "Dezembro",
-    }
+    if columns is None:
+        columns = DEFAULT_COLUMNS
+    invalidas = [c for c in columns if c not in ALL_COLUMNS]
+    if invalidas:
+        raise ValueError(f"Colunas inválidas: {', '.join(invalidas)}.")
+    check_business_day_states(columns, states)
+    if holiday_bridge:
+        # Os nomes dos feriados ficam na tabela ponte; aqui só os indicadores
+        if any(c in HOLIDAY_TEXT_COLUMNS for c in columns):
+            columns = list(columns) + HOLIDAY_FLAG_COLUMNS
+        columns = [c for c in columns if c not in HOLIDAY_TEXT_COLUMNS]
 
-    df["Ano"] = df["Data"].dt.year
-    df["Mes"] = df["Data"].dt.month
-    df["DiaDoMes"] = df["Data"].dt.day
-    df["DiaDoAno"] = df["Data"].dt.dayofyear
-    df["DiaSemana"] = (df["Data"].dt.dayofweek + 1) % 7 + 1
-    df["NomeDiaSemana"] = df["DiaSemana"].map(dias_pt)
-    df["NomeMes"] = df["Data"].dt.month.map(meses_pt)
-    df["AnoMes"] = df["Data"].dt.to_period("M").astype(str)
-    df["Trimestre"] = df["Data"].dt.quarter
-    df["Semestre"] = np.where(df["Mes"] <= 6, 1, 2)
-    df["SemanaAno"] = df["Data"].dt.strftime("%U").astype(int) + 1
-    df["SemanaAnoISO"] = df["Data"].dt.isocalendar().week.astype(int)
-    df["EhFimDeSemana"] = df["DiaSemana"].isin([1, 7])
-    df["DataInt"] = df["Data"].dt.strftime("%Y%m%d").astype(int)
-    base_excel = pd.Timestamp("1899-12-30")
-    df["DataEpoch"] = (df["Data"] - base_excel).dt.days
-    df["DataUnixPosix"] = df["Data"].astype(np.int64) // 10**9
-
-    all_nacionais = []
-    for y in range(start.year, end.year + 1):
-        all_nacionais.extend(get_holidays(y, config))
-    if all_nacionais:
-        nac_df = pd.DataFrame(all_nacionais)
-        nac_df["Data"] = pd.to_datetime(nac_df["date"])
-        df = df.merge(nac_df[["Data", "holiday"]], on="Data", how="left")
-        df.rename(columns={"holiday": "Feriado"}, inplace=True)
-    else:
-        df["Feriado"] = np.nan
-
-    if states:
-        all_estaduais = []
-        for y in range(start.year, end.year + 1):
-            all_estaduais.extend(get_state_holidays(y, states))
-        if all_estaduais:
-            est_df = pd.DataFrame(all_estaduais)
-            est_df["Data"] = pd.to_datetime(est_df["date"])
-            est_grouped = (
-                est_df.groupby("Data")
-                .agg(
+    n = max((end - start).days + 1, 0)
+    with stage("colunas_calendario", n):
+        dates = pd.date_range(start=start, end=end, freq="D")
+        df = pd.DataFrame({"Data": dates})
+        dias = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+        # Com o armazém ativo, fatias dos arquivos mapeados; sem ele, cálculo ao vivo
+        fatia = _store_range(dias)
+        if fatia is not None:
+            colunas_calendario = _store_calendar_columns(*fatia, len(dias), columns)
+        else:
+            colunas_calendario = calendar_columns(dias, columns)
+        for nome, valores in colunas_calendario.items():
+            df[nome] = valores
+
+    # Indicadores por indexação direta, sem merge
+    need_flags = any(c in HOLIDAY_FLAG_COLUMNS for c in columns)
+    if need_flags or (holiday_bridge and "EhFeriado" in columns):
+        with stage("indicadores_feriado", n):
+            if fatia is not None:
+                eh_nacional, qtd_estados = _store_holiday_flags(
+                    *fatia, len(dias), config, states
+                )
+            else:
+                eh_nacional, qtd_estados = _holiday_flags(
+                    dias, start, end, config, states
+                )
+            df["EhFeriadoNacional"] = eh_nacional
+            df["QtdEstadosFeriado"] = qtd_estados
+            if holiday_bridge:
+                df["EhFeriado"] = eh_nacional | (qtd_estados > 0)
+
+    if any(c in BUSINESS_DAY_COLUMNS for c in columns):
+        with stage("dias_uteis", n):
+            base = (
+                _store_calendar_columns(*fatia, len(dias), ["DiaDoMes", "DiaDoAno"])
+                if fatia is not None
+                else calendar_columns(dias, ["DiaDoMes", "DiaDoAno"])
+            )
+            uteis = business_day_columns(
+                dias, base["DiaDoMes"], base["DiaDoAno"], config, states
+            )
+            for nome in BUSINESS_DAY_COLUMNS:
+                if nome in columns:
+                    df[nome] = uteis[nome]
+
+    # Os merges de feriados só rodam se alguma coluna de feriado foi pedida
+    need_eh = "EhFeriado" in columns and not holiday_bridge
+    need_nacional = need_eh or "Feriado" in columns
+    need_estadual = need_eh or "Feriado Estadual" in columns or "Estado" in columns
+
+    if need_nacional:
+        with stage("feriados_nacionais", n):
+            datas, nomes, _ = holiday_dates(start.year, end.year, config)
+            if len(datas):
+                nac_df = pd.DataFrame(
+                    {"Data": datas.astype("datetime64[ns]"), "holiday": nomes}
+                )
+                if nac_df["Data"].duplicated().any():
+                    # Dois feriados nacionais na mesma data (ex.: Tiradentes na
+                    # Sexta-feira Santa) viram uma linha só, como nos estaduais
+                    nac_df = (
+                        nac_df.groupby("Data", sort=False)["holiday"]
+                        .agg(lambda x: " / ".join(list(dict.fromkeys(x))))
+                        .reset_index()
+                    )
+                df = df.merge(nac_df, on="Data", how="left")
+                df.rename(columns={"holiday": "Feriado"}, inplace=True)
+            else:
+                df["Feriado"] = np.nan
+
+    if states and need_estadual:
+        with stage("feriados_estaduais", n):
+            datas, nomes, estados = holiday_dates(
+                start.year, end.year, states=states, include_national=False
+            )
+            if len(datas):
+                est_df = pd.DataFrame(
                     {
-                        "holiday": lambda x: " / ".join(list(dict.fromkeys(x))),
-                        "Estado": lambda x: ", ".join(list(dict.fromkeys(x))),
+                        "Data": datas.astype("datetime64[ns]"),
+                        "holiday": nomes,
+                        "Estado": estados,
                     }
                 )
-                .reset_index()
+                est_grouped = (
+                    est_df.groupby("Data")
+                    .agg(
+                        {
+                            "holiday": lambda x: " / ".join(list(dict.fromkeys(x))),
+                            "Estado": lambda x: ", ".join(list(dict.fromkeys(x))),
+                        }
+                    )
+                    .reset_index()
+                )
+                df = df.merge(est_grouped, on="Data", how="left")
+                df.rename(columns={"holiday": "Feriado Estadual"}, inplace=True)
+            else:
+                df["Feriado Estadual"] = np.nan
+                df["Estado"] = np.nan
+
+    with stage("ordenacao", n):
+        if need_eh:
+            df["EhFeriado"] = df["Feriado"].notna() | (
+                df["Feriado Estadual"].notna()
+                if "Feriado Estadual" in df.columns
+                else False
             )
-            df = df.merge(est_grouped, on="Data", how="left")
-            df.rename(columns={"holiday": "Feriado Estadual"}, inplace=True)
-        else:
-            df["Feriado Estadual"] = np.nan
-            df["Estado"] = np.nan
+        df = df.sort_values("Data").reset_index(drop=True)
+        keep = [c for c in ALL_COLUMNS if c in columns and c in df.columns]
+        if keep != df.columns.tolist():
+            df = df[keep]
+    if compact:
+        with stage("compactacao", n):
+            df = compact_dtypes(df)
+    return df
+
+
+# --- GERAÇÃO EM BLOCOS ---
+def _chunk_bounds(start: date, end: date, chunk) -> Iterator[Tuple[date, date]]:
+    if isinstance(chunk, int) and not isinstance(chunk, bool):
+        if chunk < 1:
+            raise ValueError("O tamanho do bloco deve ser maior que zero.")
+        inicio = start
+        while inicio <= end:
+            fim = min(end, inicio + timedelta(days=chunk - 1))
+            yield inicio, fim
+            inicio = fim + timedelta(days=1)
+    elif chunk == "year":
+        for ano in range(start.year, end.year + 1):
+            yield max(start, date(ano, 1, 1)), min(end, date(ano, 12, 31))
+    elif chunk == "month":
+        inicio = start
+        while inicio <= end:
+            proximo = date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+            fim = min(end, proximo - timedelta(days=1))
+            yield inicio, fim
+            inicio = proximo
+    else:
+        raise ValueError("Bloco inválido: use 'year', 'month' ou um número de dias.")
+
 
-    df["EhFeriado"] = df["Feriado"].notna() | (
-        df["Feriado Estadual"].notna() if "Feriado Estadual" in df.columns else False
+def iter_date_dimension(
+    start: date, end: date, config: dict, states: List[str], chunk="year", **kwargs
+) -> Iterator[pd.DataFrame]:
+    # Mesmo resultado de generate_date_dimension, entregue em blocos contíguos;
+    # IndiceDiaUtil é absoluto, então continua consistente entre blocos
+    for inicio, fim in _chunk_bounds(start, end, chunk):
+        yield generate_date_dimension(inicio, fim, config, states, **kwargs)
+
+
+# --- ENRIQUECIMENTO DE TABELAS FATO ---
+def _iter_day_chunks(dates, chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # (dias desde 1970, máscara de nulos) por bloco, sem converter tudo de uma vez
+    pa = sys.modules.get("pyarrow")  # arrays Arrow só existem se já foi importado
+    if pa is not None and isinstance(dates, pa.ChunkedArray):
+        for parte in dates.chunks:
+            yield from _iter_day_chunks(parte, chunk_size)
+        return
+    if pa is not None and isinstance(dates, pa.Array):
+        for i in range(0, len(dates), chunk_size):
+            parte = dates.slice(i, chunk_size)
+            if not pa.types.is_date32(parte.type):
+                parte = parte.cast(pa.timestamp("ns")).cast(pa.date32())
+            valores = parte.to_numpy(zero_copy_only=False).astype("datetime64[D]")
+            yield valores.astype(np.int64), np.isnat(valores)
+        return
+    if isinstance(dates, (pd.Series, pd.Index)):
+        dates = dates.to_numpy()
+    dates = np.asarray(dates)
+    for i in range(0, len(dates), chunk_size):
+        valores = dates[i : i + chunk_size].astype("datetime64[D]")
+        yield valores.astype(np.int64), np.isnat(valores)
+
+
+def enrich(
+    dates,
+    columns: List[str],
+    states: Optional[List[str]] = None,
+    config: Optional[dict] = None,
+    chunk_size: int = 1_000_000,
+) -> pd.DataFrame:
+    # Atributos de calendário para cada data (ex.: coluna de data de uma tabela
+    # fato), por indexação direta num índice contíguo de dias, sem merge.
+    if chunk_size < 1:
+        raise ValueError("O tamanho do bloco deve ser maior que zero.")
+    invalidas = [c for c in columns if c not in ALL_COLUMNS]
+    if invalidas:
+        raise ValueError(f"Colunas inválidas: {', '.join(invalidas)}.")
+    states = states or []
+
+    # 1ª passada: tamanho, intervalo de datas e presença de nulos
+    n, lo, hi, tem_nulos = 0, None, None, False
+    for dias, nulos in _iter_day_chunks(dates, chunk_size):
+        n += len(dias)
+        tem_nulos = tem_nulos or bool(nulos.any())
+        if not nulos.all():
+            validos = dias[~nulos]
+            lo = int(validos.min()) if lo is None else min(lo, int(validos.min()))
+            hi = int(validos.max()) if hi is None else max(hi, int(validos.max()))
+    if lo is None:
+        lo = hi = 0  # só datas nulas: qualquer dia serve de base
+
+    # Índice de dias: linha k da dimensão corresponde ao dia lo + k
+    dim = generate_date_dimension(
+        np.datetime64(lo, "D").astype(date),
+        np.datetime64(hi, "D").astype(date),
+        config or {},
+        states,
+        columns=columns,
     )
-    return df.sort_values("Data").reset_index(drop=True)
+    fontes = {c: dim[c].to_numpy() for c in dim.columns}
+    saida = {}
+    for c, valores in fontes.items():
+        amostra = pd.api.extensions.take(
+            valores, np.array([-1 if tem_nulos else 0]), allow_fill=True
+        )
+        saida[c] = np.empty(n, dtype=amostra.dtype)
+
+    # 2ª passada: preenchimento por blocos
+    pos = 0
+    for dias, nulos in _iter_day_chunks(dates, chunk_size):
+        offsets = np.where(nulos, -1, dias - lo)
+        fim = pos + len(dias)
+        for c, valores in fontes.items():
+            saida[c][pos:fim] = pd.api.extensions.take(
+                valores, offsets, allow_fill=tem_nulos
+            )
+        pos = fim
+    index = dates.index if isinstance(dates, pd.Series) else None
+    # Colunas na ordem pedida
+    return pd.DataFrame({c: saida[c] for c in columns if c in saida}, index=index)
 
 
 # --- FUNÇÕES DE EXPORTAÇÃO ---
+STREAM_ROWS = 50_000
+
+
+def _row_chunks(df: pd.DataFrame, size: int = STREAM_ROWS) -> Iterator[pd.DataFrame]:
+    if df.empty:
+        yield df
+        return
+    for i in range(0, len(df), size):
+        yield df.iloc[i : i + size]
+
+
+def write_csv(
+    chunks: Iterable[pd.DataFrame], sink: BinaryIO, sep: str = ";", header: bool = True
+) -> None:
+    # Cabeçalho (com BOM) só no primeiro bloco; cada bloco é codificado e escrito.
+    # Sem cabeçalho, a saída pode ser anexada ao fim de um .csv existente.
+    primeiro = header
+    for chunk in chunks:
+        texto = chunk.to_csv(index=False, header=primeiro, sep=sep)
+        sink.write(texto.encode("utf-8-sig" if primeiro else "utf-8"))
+        primeiro = False
+
+
 def to_csv_bytes(df: pd.DataFrame, sep: str = ";") -> bytes:
-    return df.to_csv(index=False, sep=sep, encoding="utf-8-sig").encode("utf-8-sig")
+    buffer = io.BytesIO()
+    write_csv(_row_chunks(df), buffer, sep=sep)
+    return buffer.getvalue()
+
+
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_DATE_FORMAT = "dd/mm/yyyy"
+
+
+def _excel_table_name(nome: str) -> str:
+    # Nome de Tabela do Excel: sem espaços e sem parecer referência de célula (A1)
+    nome = re.sub(r"[^\w.]", "_", nome)
+    if not re.match(r"[^\W\d]", nome) or re.fullmatch(r"[A-Za-z]{1,3}\d+", nome):
+        nome = f"_{nome}"
+    return nome
+
+
+def _xlsx_cell_values(s: pd.Series) -> Tuple[str, list]:
+    # (tipo de célula, valores Python com None nos nulos) de um bloco da coluna
+    nulos = s.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        # Série do Excel, com o dia inexistente 29/02/1900 (datas antes de 1900 viram texto)
+        dias = s.to_numpy().astype("datetime64[D]").astype(np.int64)
+        serial = dias + EXCEL_EPOCH_OFFSET - (dias < -25508)
+        valores = np.where(dias < -25567, _iso_dates(s), serial.astype(object)).tolist()
+        tipo = "date"
+    elif pd.api.types.is_bool_dtype(s):
+        valores, tipo = s.astype(object).tolist(), "bool"
+    elif pd.api.types.is_numeric_dtype(s):
+        valores, tipo = s.astype(object).tolist(), "number"
+    else:
+        valores, tipo = s.astype(object).tolist(), "string"
+    for i in np.flatnonzero(nulos).tolist():
+        valores[i] = None
+    return tipo, valores
+
+
+def _add_excel_table(ws, last_row: int, columns: List[str], name: str) -> None:
+    # O xlsxwriter recusa add_table() em constant_memory (código -3) porque a Tabela
+    # grava o cabeçalho como células, e nesse modo as linhas já descarregadas não
+    # voltam. Aqui nenhuma linha foi escrita: o modo é desligado só durante a
+    # chamada e o cabeçalho é regravado depois. O comportamento é interno à
+    # biblioteca (versão fixada em requirements.txt); se mudar, a exportação falha
+    # em vez de sair sem a Tabela.
+    ws.constant_memory = False
+    try:
+        codigo = ws.add_table(
+            0,
+            0,
+            last_row,
+            max(len(columns) - 1, 0),
+            {"name": name, "columns": [{"header": c} for c in columns]},
+        )
+    finally:
+        ws.constant_memory = True
+    if codigo != 0:
+        raise RuntimeError(f"O xlsxwriter não criou a Tabela {name} (código {codigo}).")
+    for j, col in enumerate(columns):
+        ws.write_string(0, j, col)
+
+
+def _write_xlsx_table(
+    workbook, df: pd.DataFrame, sheet_name: str, date_format, max_rows: int
+) -> None:
+    # Linhas escritas em ordem (constant_memory); acima do limite, novas planilhas
+    linhas_por_planilha = max_rows - 1
+    colunas = [str(c) for c in df.columns]
+    for n, inicio in enumerate(range(0, max(len(df), 1), linhas_por_planilha)):
+        sufixo = f"_{n + 1}" if n else ""
+        nome = sheet_name[: 31 - len(sufixo)] + sufixo
+        parte = df.iloc[inicio : inicio + linhas_por_planilha]
+        ws = workbook.add_worksheet(nome)
+        # Só a largura: o formato de data vai em cada célula de dado, não no cabeçalho
+        for j, col in enumerate(df.columns):
+            if pd.api.types.is_datetime64_any_dtype(df[col]):
+                ws.set_column(j, j, 11)
+        _add_excel_table(ws, max(len(parte), 1), colunas, _excel_table_name(nome))
+        ws.freeze_panes(1, 0)
+
+        escritores = {
+            "date": ws.write_number,
+            "bool": ws.write_boolean,
+            "number": ws.write_number,
+            "string": ws.write_string,
+        }
+        linha = 1
+        for bloco in _row_chunks(parte):
+            celulas = []
+            for j, col in enumerate(df.columns):
+                tipo, valores = _xlsx_cell_values(bloco[col])
+                formato = date_format if tipo == "date" else None
+                celulas.append((j, escritores[tipo], valores, formato))
+            for i in range(len(bloco)):
+                for j, escrever, valores, formato in celulas:
+                    valor = valores[i]
+                    if valor is None:
+                        continue
+                    if isinstance(valor, str):
+                        ws.write_string(linha, j, valor)
+                    else:
+                        escrever(linha, j, valor, formato)
+                linha += 1
 
 
-def to_xlsx_bytes(df: pd.DataFrame) -> bytes:
+def to_xlsx_bytes(
+    df: pd.DataFrame,
+    extra_sheets: Optional[Dict[str, pd.DataFrame]] = None,
+    max_rows: int = EXCEL_MAX_ROWS,
+) -> bytes:
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="dCalendario")
+    import xlsxwriter
+
+    # O with fecha a pasta (e os temporários do constant_memory) mesmo com erro
+    with xlsxwriter.Workbook(buffer, {"constant_memory": True}) as workbook:
+        date_format = workbook.add_format({"num_format": EXCEL_DATE_FORMAT})
+        _write_xlsx_table(workbook, df, "dCalendario", date_format, max_rows)
+        for nome, tabela in (extra_sheets or {}).items():
+            # O Excel limita nomes de planilha a 31 caracteres
+            _write_xlsx_table(workbook, tabela, nome[:31], date_format, max_rows)
     return buffer.getvalue()
 
 
+def _json_records(df: pd.DataFrame) -> List[Dict]:
+    colunas = {
+        c: (
+            df[c].dt.strftime("%Y-%m-%d")
+            if pd.api.types.is_datetime64_any_dtype(df[c])
+            else df[c]
+        )
+        for c in df.columns
+    }
+    return pd.DataFrame(colunas).to_dict(orient="records")
+
+
+def write_json(chunks: Iterable[pd.DataFrame], sink: BinaryIO) -> None:
+    # Um único array JSON, escrito bloco a bloco (mesma saída de json.dumps(indent=2))
+    sink.write(b"[")
+    escritos = 0
+    for chunk in chunks:
+        records = _json_records(chunk)
+        if not records:
+            continue
+        texto = json.dumps(records, ensure_ascii=False, indent=2)[1:-2]
+        sink.write(("," if escritos else "").encode("utf-8") + texto.encode("utf-8"))
+        escritos += len(records)
+    sink.write(b"\n]" if escritos else b"]")
+
+
 def to_json_bytes(df: pd.DataFrame) -> bytes:
-    records = df.copy()
-    records["Data"] = records["Data"].dt.strftime("%Y-%m-%d")
-    return json.dumps(
-        records.to_dict(orient="records"), ensure_ascii=False, indent=2
+    buffer = io.BytesIO()
+    write_json(_row_chunks(df), buffer)
+    return buffer.getvalue()
+
+
+# --- EXPORTAÇÃO COLUNAR (PARQUET / ARROW) ---
+# Colunas de texto com poucos valores distintos, gravadas com dicionário
+DICTIONARY_COLUMNS = [
+    "NomeDiaSemana",
+    "NomeMes",
+    "AnoMes",
+    "Feriado",
+    "Feriado Estadual",
+    "Estado",
+    "UF",
+    "Escopo",
+]
+PARQUET_CODECS = ["zstd", "snappy", "gzip", "brotli", "lz4", "none"]
+ARROW_CODECS = ["zstd", "lz4", "uncompressed"]
+
+
+def to_arrow_table(df: pd.DataFrame) -> "pa.Table":
+    import pyarrow as pa
+
+    arrays = []
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            arr = pa.array(s.to_numpy().astype("datetime64[D]"), type=pa.date32())
+        else:
+            arr = pa.Array.from_pandas(s)
+            if pa.types.is_null(arr.type):
+                # Coluna sem nenhum valor (ex.: nenhum feriado no período)
+                arr = arr.cast(pa.string())
+            if col in DICTIONARY_COLUMNS and not pa.types.is_dictionary(arr.type):
+                arr = arr.dictionary_encode()
+        arrays.append(arr)
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def to_parquet_bytes(df: pd.DataFrame, compression: str = "zstd") -> bytes:
+    if compression not in PARQUET_CODECS:
+        raise ValueError(f"Compressão inválida para Parquet: {compression}.")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = pa.BufferOutputStream()
+    pq.write_table(
+        to_arrow_table(df),
+        buffer,
+        compression=compression,
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in df.columns],
+    )
+    return buffer.getvalue().to_pybytes()
+
+
+def to_arrow_bytes(df: pd.DataFrame, compression: str = "zstd") -> bytes:
+    if compression not in ARROW_CODECS:
+        raise ValueError(f"Compressão inválida para Arrow: {compression}.")
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    buffer = pa.BufferOutputStream()
+    feather.write_feather(to_arrow_table(df), buffer, compression=compression)
+    return buffer.getvalue().to_pybytes()
+
+
+# --- TIPOS E LITERAIS SQL POR DIALETO ---
+SQL_DIALECTS = ("ansi", "postgres", "sqlite", "mysql")
+
+_SQL_TYPES = {
+    "ansi": {
+        "date": "DATE",
+        "bool": "BOOLEAN",
+        "int16": "SMALLINT",
+        "int32": "INTEGER",
+        "int64": "BIGINT",
+        "float": "DOUBLE PRECISION",
+        "text": "VARCHAR(255)",
+    },
+    "postgres": {
+        "date": "DATE",
+        "bool": "BOOLEAN",
+        "int16": "SMALLINT",
+        "int32": "INTEGER",
+        "int64": "BIGINT",
+        "float": "DOUBLE PRECISION",
+        "text": "TEXT",
+    },
+    # O SQLite guarda datas como texto ISO e booleanos como inteiros
+    "sqlite": {
+        "date": "TEXT",
+        "bool": "INTEGER",
+        "int16": "INTEGER",
+        "int32": "INTEGER",
+        "int64": "INTEGER",
+        "float": "REAL",
+        "text": "TEXT",
+    },
+    "mysql": {
+        "date": "DATE",
+        "bool": "TINYINT(1)",
+        "int16": "SMALLINT",
+        "int32": "INT",
+        "int64": "BIGINT",
+        "float": "DOUBLE",
+        "text": "VARCHAR(255)",
+    },
+}
+
+
+def _check_dialect(dialect: str) -> None:
+    if dialect not in SQL_DIALECTS:
+        raise ValueError(f"Dialeto SQL inválido: {dialect}.")
+
+
+def _quote_ident(name: str, dialect: str = "ansi") -> str:
+    # Só coloca aspas quando o nome não é um identificador simples (ex.: "Feriado Estadual")
+    if name.isidentifier() and name.isascii():
+        return name
+    if dialect == "mysql":
+        return "`" + name.replace("`", "``") + "`"
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Largura fixa por coluna da dimensão (a do modo compacto; DataUnixPosix em 64 bits),
+# e não a faixa exportada: as cargas incrementais seguintes precisam caber na tabela
+_SQL_INT_COLUMNS = {
+    **{
+        c: "int32" if t == "int32" else "int16"
+        for c, t in COMPACT_DTYPES.items()
+        if isinstance(t, str) and t.startswith("int")
+    },
+    "DataUnixPosix": "int64",
+}
+
+
+def _sql_column_type(s: pd.Series, dialect: str = "ansi") -> str:
+    tipos = _SQL_TYPES[dialect]
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return tipos["date"]
+    if pd.api.types.is_bool_dtype(s):
+        return tipos["bool"]
+    if pd.api.types.is_integer_dtype(s):
+        if s.name in _SQL_INT_COLUMNS:
+            return tipos[_SQL_INT_COLUMNS[s.name]]
+        # Fora da dimensão, a largura do próprio dtype (SMALLINT no mínimo)
+        return tipos[f"int{max(s.dtype.itemsize, 2) * 8}"]
+    if pd.api.types.is_float_dtype(s) and s.notna().any():
+        return tipos["float"]
+    return tipos["text"]
+
+
+def _create_table_sql(df: pd.DataFrame, table_name: str, dialect: str = "ansi") -> str:
+    create_cols = [
+        f"{_quote_ident(c, dialect)} {_sql_column_type(df[c], dialect)}"
+        for c in df.columns
+    ]
+    return (
+        f"CREATE TABLE {_quote_ident(table_name, dialect)} (\n  "
+        + ",\n  ".join(create_cols)
+        + "\n);"
+    )
+
+
+def _iso_dates(s: pd.Series) -> np.ndarray:
+    return np.datetime_as_string(s.to_numpy().astype("datetime64[D]"), unit="D")
+
+
+def _sql_literals(s: pd.Series, dialect: str = "ansi") -> np.ndarray:
+    # Formata a coluna (ou o lote) de uma vez, de acordo com o dtype
+    mask = s.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        lit = np.char.add(np.char.add("'", _iso_dates(s)), "'").astype(object)
+    elif pd.api.types.is_bool_dtype(s):
+        flags = s.fillna(False).to_numpy(dtype=bool)
+        sim, nao = ("1", "0") if dialect == "sqlite" else ("TRUE", "FALSE")
+        lit = np.where(flags, sim, nao).astype(object)
+    elif pd.api.types.is_numeric_dtype(s):
+        lit = s.astype(str).to_numpy(dtype=object)
+    else:
+        # Laço direto: em lotes pequenos, o acessor .str custa mais que o próprio texto
+        barra = "\\\\" if dialect == "mysql" else "\\"
+        lit = np.array(
+            [
+                "'" + str(v).replace("\\", barra).replace("'", "''") + "'"
+                for v in s.to_numpy(dtype=object)
+            ],
+            dtype=object,
+        )
+    return np.where(mask, "NULL", lit)
+
+
+def _copy_text_fields(s: pd.Series, true_val: str, false_val: str) -> np.ndarray:
+    # Campos no formato texto do COPY (PostgreSQL) / LOAD DATA (MySQL): \N é nulo
+    mask = s.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        campos = _iso_dates(s).astype(object)
+    elif pd.api.types.is_bool_dtype(s):
+        flags = s.fillna(False).to_numpy(dtype=bool)
+        campos = np.where(flags, true_val, false_val).astype(object)
+    elif pd.api.types.is_numeric_dtype(s):
+        campos = s.astype(str).to_numpy(dtype=object)
+    else:
+        campos = np.array(
+            [
+                str(v)
+                .replace("\\", "\\\\")
+                .replace("\t", "\\t")
+                .replace("\n", "\\n")
+                .replace("\r", "\\r")
+                for v in s.to_numpy(dtype=object)
+            ],
+            dtype=object,
+        )
+    return np.where(mask, "\\N", campos)
+
+
+def _iter_copy_text_rows(
+    df: pd.DataFrame, true_val: str, false_val: str, batch_size: int
+) -> Iterator[bytes]:
+    # Formata um lote por vez: só as linhas do lote ficam em memória
+    for i in range(0, len(df), batch_size):
+        lote = df.iloc[i : i + batch_size]
+        campos = [_copy_text_fields(lote[c], true_val, false_val) for c in lote.columns]
+        linhas = ["\t".join(vals) for vals in zip(*campos)]
+        yield ("\n".join(linhas) + "\n").encode("utf-8")
+
+
+# --- EXPORTAÇÃO SQL ---
+def iter_sql_script(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    batch_size: int = 1000,
+    dialect: str = "ansi",
+) -> Iterator[bytes]:
+    if batch_size < 1:
+        raise ValueError("O tamanho do lote deve ser maior que zero.")
+    _check_dialect(dialect)
+    yield (_create_table_sql(df, table_name, dialect) + "\n").encode("utf-8")
+    yield from _iter_sql_inserts(df, table_name, batch_size, dialect)
+
+
+def _iter_sql_inserts(
+    df: pd.DataFrame, table_name: str, batch_size: int, dialect: str
+) -> Iterator[bytes]:
+    cols = ", ".join(_quote_ident(c, dialect) for c in df.columns)
+    cabecalho = f"\nINSERT INTO {_quote_ident(table_name, dialect)} ({cols}) VALUES\n"
+    for lote in _iter_sql_values(df, batch_size, dialect):
+        yield (cabecalho + lote + ";\n").encode("utf-8")
+
+
+def _iter_sql_values(df: pd.DataFrame, batch_size: int, dialect: str) -> Iterator[str]:
+    # Tuplas "(...)" de um lote por vez: só as linhas do lote ficam em memória
+    for i in range(0, len(df), batch_size):
+        lote = df.iloc[i : i + batch_size]
+        literais = [_sql_literals(lote[c], dialect) for c in lote.columns]
+        yield ",\n".join("(" + ", ".join(vals) + ")" for vals in zip(*literais))
+
+
+def to_sql_script(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    batch_size: int = 1000,
+    dialect: str = "ansi",
+) -> bytes:
+    return b"".join(iter_sql_script(df, table_name, batch_size, dialect))
+
+
+def write_sql(
+    chunks: Iterable[pd.DataFrame],
+    sink: BinaryIO,
+    table_name: str = "dCalendario",
+    batch_size: int = 1000,
+    dialect: str = "ansi",
+) -> None:
+    # Os tipos do CREATE TABLE vêm do primeiro bloco
+    if batch_size < 1:
+        raise ValueError("O tamanho do lote deve ser maior que zero.")
+    _check_dialect(dialect)
+    criado = False
+    for chunk in chunks:
+        if not criado:
+            sink.write((_create_table_sql(chunk, table_name, dialect) + "\n").encode())
+            criado = True
+        for parte in _iter_sql_inserts(chunk, table_name, batch_size, dialect):
+            sink.write(parte)
+
+
+def iter_upsert_script(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    key: str = "Data",
+    batch_size: int = 1000,
+    dialect: str = "ansi",
+) -> Iterator[bytes]:
+    # Insere as linhas novas e reescreve as existentes, casando pela coluna chave:
+    # MERGE (ANSI), ON CONFLICT (PostgreSQL/SQLite) ou ON DUPLICATE KEY (MySQL)
+    if batch_size < 1:
+        raise ValueError("O tamanho do lote deve ser maior que zero.")
+    _check_dialect(dialect)
+    if key not in df.columns:
+        raise ValueError(f"A coluna chave {key} não está na tabela.")
+    tabela = _quote_ident(table_name, dialect)
+    chave = _quote_ident(key, dialect)
+    nomes = [_quote_ident(c, dialect) for c in df.columns]
+    cols = ", ".join(nomes)
+    outras = [n for n, c in zip(nomes, df.columns) if c != key]
+
+    if dialect == "ansi":
+        cabecalho = f"\nMERGE INTO {tabela} AS alvo\nUSING (VALUES\n"
+        rodape = (
+            f"\n) AS novo ({cols})\nON alvo.{chave} = novo.{chave}\n"
+            "WHEN MATCHED THEN UPDATE SET "
+            + ", ".join(f"{n} = novo.{n}" for n in outras)
+            + f"\nWHEN NOT MATCHED THEN INSERT ({cols}) VALUES ("
+            + ", ".join(f"novo.{n}" for n in nomes)
+            + ");\n"
+        )
+    else:
+        cabecalho = f"\nINSERT INTO {tabela} ({cols}) VALUES\n"
+        if dialect == "mysql":
+            yield (
+                f"-- Requer chave única em {chave}: "
+                f"ALTER TABLE {tabela} ADD UNIQUE ({chave});\n"
+            ).encode("utf-8")
+            sets = ", ".join(f"{n} = VALUES({n})" for n in outras)
+            rodape = f"\nON DUPLICATE KEY UPDATE {sets};\n"
+        else:
+            indice = _quote_ident(f"ux_{table_name}_{key}", dialect)
+            yield (
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {indice} ON {tabela} ({chave});\n"
+            ).encode("utf-8")
+            sets = ", ".join(f"{n} = excluded.{n}" for n in outras)
+            rodape = f"\nON CONFLICT ({chave}) DO UPDATE SET {sets};\n"
+
+    for lote in _iter_sql_values(df, batch_size, dialect):
+        yield (cabecalho + lote + rodape).encode("utf-8")
+
+
+def to_upsert_script(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    key: str = "Data",
+    batch_size: int = 1000,
+    dialect: str = "ansi",
+) -> bytes:
+    return b"".join(iter_upsert_script(df, table_name, key, batch_size, dialect))
+
+
+def iter_postgres_copy_script(
+    df: pd.DataFrame, table_name: str = "dCalendario", batch_size: int = 5000
+) -> Iterator[bytes]:
+    if batch_size < 1:
+        raise ValueError("O tamanho do lote deve ser maior que zero.")
+    yield (_create_table_sql(df, table_name, "postgres") + "\n\n").encode("utf-8")
+    cols = ", ".join(_quote_ident(c, "postgres") for c in df.columns)
+    yield (
+        f"COPY {_quote_ident(table_name, 'postgres')} ({cols}) FROM STDIN;\n"
     ).encode("utf-8")
+    yield from _iter_copy_text_rows(df, "t", "f", batch_size)
+    yield b"\\.\n"
+
 
+def to_postgres_copy_script(df: pd.DataFrame, table_name: str = "dCalendario") -> bytes:
+    return b"".join(iter_postgres_copy_script(df, table_name))
 
-def to_sql_script(df: pd.DataFrame, table_name: str = "dCalendario") -> bytes:
-    cols = df.columns.tolist()
 
-    def map_sql_type(col_name):
-        if "Data" in col_name and "Int" not in col_name:
-            return "DATE"
-        if df[col_name].dtype in [np.int64, np.int32, "int64"]:
-            return "INT"
-        if df[col_name].dtype == bool:
-            return "BOOLEAN"
-        return "VARCHAR(255)"
+def _sqlite_values(s: pd.Series) -> list:
+    # Valores nativos do Python por coluna (None para nulos), prontos para o executemany
+    mask = s.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s):
+        vals = _iso_dates(s).astype(object)
+    elif pd.api.types.is_bool_dtype(s):
+        vals = s.fillna(False).to_numpy(dtype=bool).astype(np.int64).astype(object)
+    elif pd.api.types.is_integer_dtype(s):
+        vals = s.fillna(0).to_numpy(dtype=np.int64).astype(object)
+    elif pd.api.types.is_float_dtype(s):
+        vals = s.to_numpy(dtype=np.float64).astype(object)
+    else:
+        vals = s.astype(object).to_numpy()
+    return np.where(mask, None, vals).tolist()
+
 
-    create_cols = [f"{c} {map_sql_type(c)}" for c in cols]
-    create_stmt = (
-        f"CREATE TABLE {table_name} (\n  " + ",\n  ".join(create_cols) + "\n);"
+def to_sqlite_bytes(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    extra_tables: Optional[Dict[str, pd.DataFrame]] = None,
+) -> bytes:
+    tabelas = {table_name: df, **(extra_tables or {})}
+    con = sqlite3.connect(":memory:")
+    try:
+        # Uma única transação para todas as linhas
+        with con:
+            for nome, tabela in tabelas.items():
+                con.execute(_create_table_sql(tabela, nome, "sqlite"))
+                placeholders = ", ".join("?" for _ in tabela.columns)
+                insert = f"INSERT INTO {_quote_ident(nome, 'sqlite')} VALUES ({placeholders})"
+                colunas = [_sqlite_values(tabela[c]) for c in tabela.columns]
+                con.executemany(insert, zip(*colunas))
+        return con.serialize()
+    finally:
+        con.close()
+
+
+def _mysql_load_data_sql(df: pd.DataFrame, table_name: str, data_file: str) -> str:
+    cols = ", ".join(_quote_ident(c, "mysql") for c in df.columns)
+    return (
+        _create_table_sql(df, table_name, "mysql")
+        + "\n\n"
+        + f"LOAD DATA LOCAL INFILE '{data_file}'\n"
+        + f"INTO TABLE {_quote_ident(table_name, 'mysql')}\n"
+        + "CHARACTER SET utf8mb4\n"
+        + "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'\n"
+        + "LINES TERMINATED BY '\\n'\n"
+        + f"({cols});\n"
     )
 
-    inserts = []
-    for _, row in df.iterrows():
-        vals = []
-        for col in cols:
-            val = row[col]
-            if pd.isna(val):
-                vals.append("NULL")
-            elif isinstance(val, (date, datetime, pd.Timestamp)):
-                vals.append(f"'{val.strftime('%Y-%m-%d')}'")
-            elif isinstance(val, str):
-                vals.append(f"'{val.replace(chr(39), chr(39)+chr(39))}'")
-            elif isinstance(val, bool):
-                vals.append("TRUE" if val else "FALSE")
-            else:
-                vals.append(str(val))
 
-        inserts.append(
-            f"INSERT INTO {table_name} ({', '.join(cols)}) VALUES ({', '.join(vals)});"
+def to_mysql_load_data(
+    df: pd.DataFrame,
+    table_name: str = "dCalendario",
+    extra_tables: Optional[Dict[str, pd.DataFrame]] = None,
+) -> bytes:
+    # Script LOAD DATA + um arquivo de dados (.tsv) por tabela, em um .zip
+    tabelas = {table_name: df, **(extra_tables or {})}
+    script = "\n".join(
+        _mysql_load_data_sql(tabela, nome, f"{nome}.tsv")
+        for nome, tabela in tabelas.items()
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{table_name}.sql", script.encode("utf-8"))
+        for nome, tabela in tabelas.items():
+            with zf.open(f"{nome}.tsv", "w") as dados:
+                for chunk in _iter_copy_text_rows(tabela, "1", "0", 5000):
+                    dados.write(chunk)
+    return buffer.getvalue()
+
+
+# Formato -> (extensão do arquivo, MIME type)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "xlsx": (
+        "xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+    "json": ("json", "application/json"),
+    "sql": ("sql", "application/sql"),
+    "postgres": ("sql", "application/sql"),
+    "sqlite": ("db", "application/vnd.sqlite3"),
+    "mysql": ("zip", "application/zip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+# Formatos de uma tabela por arquivo: com a tabela ponte, vão juntos em um .zip
+SINGLE_TABLE_FORMATS = ["csv", "json", "parquet", "arrow"]
+BRIDGE_SUFFIX = "_Feriados"
+
+
+# --- COMPRESSÃO DOS FORMATOS DE TEXTO ---
+TEXT_FORMATS = ["csv", "json", "sql", "postgres"]
+# zstd é opcional: só aparece se o pacote zstandard estiver instalado
+TEXT_CODECS = ["none", "gzip", "zip"] + (["zstd"] if find_spec("zstandard") else [])
+COMPRESSED_TYPES = {
+    "gzip": ("gz", "application/gzip"),
+    "zip": ("zip", "application/zip"),
+    "zstd": ("zst", "application/zstd"),
+}
+
+
+@contextmanager
+def _compressed_sink(buffer: BinaryIO, compression: str) -> Iterator[BinaryIO]:
+    # Cada bloco é comprimido ao ser escrito: o texto completo nunca fica na memória
+    if compression == "gzip":
+        with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as sink:
+            yield sink
+    elif compression == "zstd":
+        import zstandard
+
+        with zstandard.ZstdCompressor().stream_writer(buffer, closefd=False) as sink:
+            yield sink
+    else:
+        with nullcontext(buffer) as sink:
+            yield sink
+
+
+def _write_text(
+    sink: BinaryIO, fmt: str, df: pd.DataFrame, csv_sep: str, table_name: str
+) -> None:
+    if fmt == "csv":
+        write_csv(_row_chunks(df), sink, sep=csv_sep)
+    elif fmt == "json":
+        write_json(_row_chunks(df), sink)
+    else:
+        partes = (
+            iter_sql_script(df, table_name=table_name)
+            if fmt == "sql"
+            else iter_postgres_copy_script(df, table_name=table_name)
         )
+        for parte in partes:
+            sink.write(parte)
+
 
-    return (create_stmt + "\n\n" + "\n".join(inserts)).encode("utf-8")
+def _write_text_tables(
+    sink: BinaryIO, fmt: str, tables: Dict[str, pd.DataFrame], csv_sep: str
+) -> None:
+    for i, (nome, tabela) in enumerate(tables.items()):
+        if i:
+            sink.write(b"\n")
+        _write_text(sink, fmt, tabela, csv_sep, nome)
+
+
+def _write_export_text(
+    sink: BinaryIO,
+    tables: Dict[str, pd.DataFrame],
+    fmt: str,
+    csv_sep: str,
+    compression: str,
+) -> str:
+    ext, mime = EXPORT_FORMATS[fmt]
+    em_zip = fmt in SINGLE_TABLE_FORMATS and len(tables) > 1
+    if compression == "zip" or em_zip:
+        # Um membro por tabela (csv/json) ou um único script com todas (sql)
+        membros = (
+            {nome: {nome: tabela} for nome, tabela in tables.items()}
+            if fmt in SINGLE_TABLE_FORMATS
+            else {next(iter(tables)): tables}
+        )
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for nome, grupo in membros.items():
+                with zf.open(f"{nome}.{ext}", "w") as membro:
+                    _write_text_tables(membro, fmt, grupo, csv_sep)
+        return "application/zip"
+    with _compressed_sink(sink, compression) as destino:
+        _write_text_tables(destino, fmt, tables, csv_sep)
+    if compression in COMPRESSED_TYPES:
+        mime = COMPRESSED_TYPES[compression][1]
+    return mime
+
+
+def export_file_name(
+    filename: str,
+    fmt: str,
+    with_bridge: bool = False,
+    compression: Optional[str] = None,
+) -> str:
+    ext = EXPORT_FORMATS[fmt][0]
+    if fmt in TEXT_FORMATS and compression in COMPRESSED_TYPES:
+        if compression == "zip" or (with_bridge and fmt in SINGLE_TABLE_FORMATS):
+            return f"{filename}.zip"
+        return f"{filename}.{ext}.{COMPRESSED_TYPES[compression][0]}"
+    if with_bridge and fmt in SINGLE_TABLE_FORMATS:
+        return f"{filename}.zip"
+    return f"{filename}.{ext}"
+
+
+def _export_single(df: pd.DataFrame, fmt: str, compression: Optional[str]) -> bytes:
+    if fmt == "parquet":
+        return to_parquet_bytes(df, compression=compression or "zstd")
+    return to_arrow_bytes(df, compression=compression or "zstd")
 
 
 def export_dataframe(
-    df: pd.DataFrame, fmt: str, csv_sep: str, filename: str
+    df: pd.DataFrame,
+    fmt: str,
+    csv_sep: str,
+    filename: str,
+    compression: Optional[str] = None,
+    bridge: Optional[pd.DataFrame] = None,
 ) -> Tuple[bytes, str]:
     fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError("Formato inválido.")
+    ext, mime = EXPORT_FORMATS[fmt]
+    extras = {} if bridge is None else {f"{filename}{BRIDGE_SUFFIX}": bridge}
+
+    if fmt in TEXT_FORMATS:
+        # A etapa de exportação é medida em write_export
+        buffer = io.BytesIO()
+        mime = write_export(buffer, df, fmt, csv_sep, filename, compression, bridge)
+        return buffer.getvalue(), mime
+    with stage(f"exportacao_{fmt}", len(df)):
+        if fmt in SINGLE_TABLE_FORMATS:
+            if not extras:
+                return _export_single(df, fmt, compression), mime
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for nome, tabela in {filename: df, **extras}.items():
+                    dados = _export_single(tabela, fmt, compression)
+                    zf.writestr(f"{nome}.{ext}", dados)
+            return buffer.getvalue(), "application/zip"
+        if fmt == "xlsx":
+            return to_xlsx_bytes(df, extra_sheets=extras), mime
+        if fmt == "sqlite":
+            return to_sqlite_bytes(df, table_name=filename, extra_tables=extras), mime
+        return to_mysql_load_data(df, table_name=filename, extra_tables=extras), mime
+
+
+def write_export(
+    sink: BinaryIO,
+    df: pd.DataFrame,
+    fmt: str,
+    csv_sep: str,
+    filename: str,
+    compression: Optional[str] = None,
+    bridge: Optional[pd.DataFrame] = None,
+) -> str:
+    # Igual a export_dataframe, mas grava em sink; texto vai direto, sem cópia em memória
+    fmt = fmt.lower()
+    if fmt in TEXT_FORMATS:
+        compression = compression or "none"
+        if compression not in TEXT_CODECS:
+            raise ValueError(f"Compressão indisponível para {fmt}: {compression}.")
+        extras = {} if bridge is None else {f"{filename}{BRIDGE_SUFFIX}": bridge}
+        with stage(f"exportacao_{fmt}", len(df)):
+            return _write_export_text(
+                sink, {filename: df, **extras}, fmt, csv_sep, compression
+            )
+    data, mime = export_dataframe(df, fmt, csv_sep, filename, compression, bridge)
+    sink.write(data)
+    return mime
+
+
+STREAM_FORMATS = ["csv", "json", "sql"]
+
+
+def stream_dimension(
+    sink: BinaryIO,
+    fmt: str,
+    start: date,
+    end: date,
+    config: dict,
+    states: List[str],
+    chunk="year",
+    csv_sep: str = ";",
+    table_name: str = "dCalendario",
+    **kwargs,
+) -> None:
+    # Gera e grava direto em sink, bloco a bloco, sem montar a tabela inteira
+    fmt = fmt.lower()
+    if fmt not in STREAM_FORMATS:
+        raise ValueError("Formato sem suporte a gravação em blocos.")
+    if kwargs.get("holiday_bridge"):
+        raise ValueError("A tabela ponte não é suportada na gravação em blocos.")
+    chunks = iter_date_dimension(start, end, config, states, chunk=chunk, **kwargs)
     if fmt == "csv":
-        return to_csv_bytes(df, sep=csv_sep), "text/csv"
-    if fmt == "xlsx":
-        return (
-            to_xlsx_bytes(df),
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        write_csv(chunks, sink, sep=csv_sep)
+    elif fmt == "json":
+        write_json(chunks, sink)
+    else:
+        write_sql(chunks, sink, table_name=table_name)
+
+
+# --- EXTENSÃO INCREMENTAL ---
+# Colunas que mudam quando as regras de feriados mudam (as de calendário nunca mudam)
+HOLIDAY_DEPENDENT_COLUMNS = (
+    HOLIDAY_TEXT_COLUMNS + HOLIDAY_FLAG_COLUMNS + ["EhFeriado"] + BUSINESS_DAY_COLUMNS
+)
+DELTA_FORMATS = ["csv", "json", "parquet", "arrow", "sql"]
+
+
+class IncrementPlan(NamedTuple):
+    last_date: date
+    new_rows: pd.DataFrame
+    changed_rows: pd.DataFrame
+    changed_columns: Dict[str, int]
+
+
+def read_dimension(
+    source, fmt: Optional[str] = None, csv_sep: str = ";", table_name: str = None
+) -> pd.DataFrame:
+    # Lê uma tabela já exportada (.csv, .parquet, script .sql ou banco .db)
+    source = Path(source)
+    fmt = (fmt or source.suffix.lstrip(".")).lower()
+    if fmt == "csv":
+        df = pd.read_csv(source, sep=csv_sep, encoding="utf-8-sig")
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(source).to_pandas()
+    elif fmt in ("sql", "db", "sqlite"):
+        # Scripts ANSI/SQLite/MySQL rodam num SQLite em memória
+        if fmt == "sql":
+            con = sqlite3.connect(":memory:")
+            con.executescript(source.read_text(encoding="utf-8"))
+        else:
+            con = sqlite3.connect(source)
+        try:
+            if table_name is None:
+                table_name = con.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' LIMIT 1"
+                ).fetchone()[0]
+            df = pd.read_sql_query(f"SELECT * FROM {_quote_ident(table_name)}", con)
+        finally:
+            con.close()
+    else:
+        raise ValueError(f"Formato sem suporte para leitura: {fmt}.")
+    if "Data" in df.columns:
+        df["Data"] = pd.to_datetime(df["Data"])
+    return df
+
+
+def _comparable(s: pd.Series, like: pd.Series) -> pd.Series:
+    # Normaliza a coluna lida do arquivo para o tipo da coluna gerada agora
+    if pd.api.types.is_datetime64_any_dtype(like):
+        return pd.to_datetime(s, errors="coerce").dt.strftime("%Y-%m-%d")
+    if pd.api.types.is_bool_dtype(like):
+        return s.map(
+            lambda v: v if pd.isna(v) else str(v).lower() in ("true", "1", "t")
+        )
+    if pd.api.types.is_numeric_dtype(like):
+        return pd.to_numeric(s, errors="coerce").astype(float)
+    return s.astype(object).where(s.notna(), None)
+
+
+def _differs(a: pd.Series, b: pd.Series) -> np.ndarray:
+    a, b = a.reset_index(drop=True), b.reset_index(drop=True)
+    iguais = (a == b).fillna(False).to_numpy(dtype=bool)
+    return ~(iguais | (a.isna() & b.isna()).to_numpy())
+
+
+def plan_increment(
+    end: date,
+    config: dict,
+    states: List[str],
+    existing: Optional[pd.DataFrame] = None,
+    last_date: Optional[date] = None,
+    columns: Optional[List[str]] = None,
+    compact: bool = False,
+) -> IncrementPlan:
+    # Só o intervalo que falta é gerado; nas linhas já existentes, apenas as
+    # colunas de feriados e dias úteis são recalculadas e comparadas
+    if existing is not None and last_date is not None:
+        raise ValueError(
+            "Informe a tabela existente ou a última data carregada, não as duas."
+        )
+    if existing is not None:
+        desconhecidas = [c for c in existing.columns if c not in ALL_COLUMNS]
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(desconhecidas)}.")
+        if "Data" not in existing.columns:
+            raise ValueError("A tabela existente precisa da coluna Data.")
+        if existing.empty:
+            raise ValueError(
+                "A tabela existente está vazia: informe a última data carregada."
+            )
+        columns = existing.columns.tolist()
+        datas = pd.to_datetime(existing["Data"])
+        last_date = datas.max().date()
+    elif last_date is None:
+        raise ValueError("Informe a tabela existente ou a última data carregada.")
+
+    inicio = last_date + timedelta(days=1)
+    if inicio <= end:
+        novas = generate_date_dimension(
+            inicio, end, config, states, compact=compact, columns=columns
         )
-    if fmt == "json":
-        return to_json_bytes(df), "application/json"
+    else:
+        novas = generate_date_dimension(
+            last_date, last_date, config, states, compact=compact, columns=columns
+        ).iloc[:0]
+
+    alteradas, contagem = novas.iloc[:0], {}
+    comparaveis = [c for c in HOLIDAY_DEPENDENT_COLUMNS if c in (columns or [])]
+    if existing is not None and comparaveis and len(existing):
+        atual = generate_date_dimension(
+            datas.min().date(),
+            last_date,
+            config,
+            states,
+            compact=compact,
+            columns=columns,
+        )
+        antigo = existing.assign(Data=datas).set_index("Data")
+        antigo = antigo.reindex(atual["Data"])
+        mudou = np.zeros(len(atual), dtype=bool)
+        for c in comparaveis:
+            diferentes = _differs(
+                _comparable(antigo[c], atual[c]), _comparable(atual[c], atual[c])
+            )
+            if diferentes.any():
+                contagem[c] = int(diferentes.sum())
+                mudou |= diferentes
+        alteradas = atual[mudou].reset_index(drop=True)
+    return IncrementPlan(last_date, novas, alteradas, contagem)
+
+
+def export_delta(
+    plan: IncrementPlan,
+    fmt: str,
+    csv_sep: str = ";",
+    filename: str = "dCalendario",
+    dialect: str = "ansi",
+    compression: Optional[str] = None,
+) -> Tuple[bytes, str, str]:
+    # SQL: um script de upsert com as linhas novas e as alteradas.
+    # Arquivos: as linhas novas prontas para anexar (.csv sem cabeçalho); se houver
+    # linhas alteradas, elas vão num segundo arquivo, dentro de um .zip.
+    fmt = fmt.lower()
+    if fmt not in DELTA_FORMATS:
+        raise ValueError(f"Formato sem suporte a delta: {fmt}.")
     if fmt == "sql":
-        return to_sql_script(df, table_name=filename), "application/sql"
-    raise ValueError("Formato inválido.")
+        linhas = pd.concat([plan.changed_rows, plan.new_rows], ignore_index=True)
+        script = to_upsert_script(linhas, table_name=filename, dialect=dialect)
+        return script, EXPORT_FORMATS["sql"][1], f"{filename}_delta.sql"
+
+    ext, mime = EXPORT_FORMATS[fmt]
+    if fmt == "csv":
+        buffer = io.BytesIO()
+        write_csv(_row_chunks(plan.new_rows), buffer, sep=csv_sep, header=False)
+        novas = buffer.getvalue()
+    else:
+        novas, _ = export_dataframe(plan.new_rows, fmt, csv_sep, filename, compression)
+    if plan.changed_rows.empty:
+        return novas, mime, f"{filename}_delta.{ext}"
+    alteradas, _ = export_dataframe(
+        plan.changed_rows, fmt, csv_sep, filename, compression
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{filename}_novas.{ext}", novas)
+        zf.writestr(f"{filename}_alteradas.{ext}", alteradas)
+    return buffer.getvalue(), "application/zip", f"{filename}_delta.zip"
+
+
+# --- CACHE DE RESULTADOS (COMPARTILHADO ENTRE SESSÕES) ---
+CACHE_BUDGET_BYTES = 512 * 1024**2
+
+
+class ResultCache:
+    """LRU limitado por bytes; seguro entre as threads das sessões do Streamlit.
+
+    Os valores guardados são compartilhados: quem lê não deve alterá-los.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple, Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Tuple) -> bool:
+        return key in self._items
+
+    def get(self, key: Tuple):
+        with self._lock:
+            if key not in self._items:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key][0]
+
+    def put(self, key: Tuple, value, size: int) -> None:
+        with self._lock:
+            if key in self._items:
+                self.used_bytes -= self._items.pop(key)[1]
+            if size > self.max_bytes:
+                return  # maior que o orçamento inteiro: não vale despejar tudo
+            while self._items and self.used_bytes + size > self.max_bytes:
+                self.used_bytes -= self._items.popitem(last=False)[1][1]
+            self._items[key] = (value, size)
+            self.used_bytes += size
+
+    def get_or_create(
+        self, key: Tuple, factory: Callable[[], object], sizeof: Callable[[object], int]
+    ) -> Tuple[object, bool]:
+        # Duas sessões podem calcular a mesma chave ao mesmo tempo; o resultado é igual
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = factory()
+        self.put(key, value, sizeof(value))
+        return value, False
+
+
+def result_cache() -> ResultCache:
+    # A interface embrulha com st.cache_resource: uma única instância viva entre
+    # reruns e sessões
+    return ResultCache()
+
+
+def _frame_bytes(df: Optional[pd.DataFrame]) -> int:
+    return 0 if df is None else int(df.memory_usage(deep=True).sum())
+
+
+def dimension_cache_key(
+    start: date,
+    end: date,
+    config: dict,
+    states: List[str],
+    compact: bool = False,
+    columns: Optional[List[str]] = None,
+    holiday_bridge: bool = False,
+) -> Tuple:
+    colunas = DEFAULT_COLUMNS if columns is None else columns
+    return (
+        "dimensao",
+        start,
+        end,
+        config_key(config),
+        tuple(sorted(set(states))),
+        tuple(c for c in ALL_COLUMNS if c in colunas),
+        bool(compact),
+        bool(holiday_bridge),
+    )
+
+
+def export_cache_key(
+    dimension_key: Tuple,
+    fmt: str,
+    csv_sep: str,
+    filename: str,
+    compression: Optional[str] = None,
+) -> Tuple:
+    fmt = fmt.lower()
+    return (
+        "exportacao",
+        dimension_key,
+        fmt,
+        csv_sep if fmt == "csv" else None,
+        filename,
+        compression or None,
+    )
+
+
+def cached_dimension(
+    cache: ResultCache,
+    start: date,
+    end: date,
+    config: dict,
+    states: List[str],
+    compact: bool = False,
+    columns: Optional[List[str]] = None,
+    holiday_bridge: bool = False,
+) -> Tuple[pd.DataFrame, Optional[pd.DataFrame], bool]:
+    def gerar():
+        df = generate_date_dimension(
+            start,
+            end,
+            config,
+            states,
+            compact=compact,
+            columns=columns,
+            holiday_bridge=holiday_bridge,
+        )
+        bridge = None
+        if holiday_bridge:
+            bridge = generate_holiday_bridge(
+                start, end, config, states, compact=compact
+            )
+        return df, bridge
+
+    key = dimension_cache_key(
+        start, end, config, states, compact, columns, holiday_bridge
+    )
+    (df, bridge), hit = cache.get_or_create(
+        key, gerar, lambda v: _frame_bytes(v[0]) + _frame_bytes(v[1])
+    )
+    return df, bridge, hit
+
+
+def cached_export(
+    cache: ResultCache,
+    dimension_key: Tuple,
+    df: pd.DataFrame,
+    fmt: str,
+    csv_sep: str,
+    filename: str,
+    compression: Optional[str] = None,
+    bridge: Optional[pd.DataFrame] = None,
+) -> Tuple[bytes, str, bool]:
+    key = export_cache_key(dimension_key, fmt, csv_sep, filename, compression)
+    (data, mime), hit = cache.get_or_create(
+        key,
+        lambda: export_dataframe(df, fmt, csv_sep, filename, compression, bridge),
+        lambda v: len(v[0]),
+    )
+    return data, mime, hit
 
 
 # --- INTERFACE ---
 def main():
+    import streamlit as st
+
     st.set_page_config(page_title="Calendário Brasil BI", page_icon="📅", layout="wide")
     st.title("📅 Gerador de Tabela Dimensão Calendário")
 
@@ -344,30 +1992,7 @@ def main():
         }
 
     st.subheader("Feriados Estaduais")
-    lista_estados = [
-        "Acre",
-        "Alagoas",
-        "Amapá",
-        "Amazonas",
-        "Bahia",
-        "Ceará",
-        "Distrito Federal",
-        "Espírito Santo",
-        "Maranhão",
-        "Mato Grosso do Sul",
-        "Minas Gerais",
-        "Pará",
-        "Paraíba",
-        "Pernambuco",
-        "Piauí",
-        "Rio de Janeiro",
-        "Rio Grande do Sul",
-        "Rondônia",
-        "Roraima",
-        "Sergipe",
-        "São Paulo",
-        "Tocantins",
-    ]
+    lista_estados = list(HOLIDAY_STATES)
 
     # --- CORREÇÃO 2: Lógica de Seleção "Todos os Estados" ---
     # Usamos o session_state do Streamlit para manipular a lista de forma inteligente
@@ -397,24 +2022,132 @@ def main():
     with col_f1:
         filename = st.text_input("Nome da tabela/arquivo", value="dCalendario")
     with col_f2:
-        fmt = st.selectbox("Formato", options=["csv", "xlsx", "json", "sql"])
+        fmt = st.selectbox("Formato", options=list(EXPORT_FORMATS))
     with col_f3:
         csv_sep = (
             st.text_input("Separador (se CSV)", value=";") if fmt == "csv" else ";"
         )
+        compression = None
+        if fmt in TEXT_FORMATS:
+            compression = st.selectbox("Compressão", options=TEXT_CODECS)
+        elif fmt == "parquet":
+            compression = st.selectbox("Compressão", options=PARQUET_CODECS)
+        elif fmt == "arrow":
+            compression = st.selectbox("Compressão", options=ARROW_CODECS)
+    columns = st.multiselect(
+        "Colunas da tabela",
+        options=ALL_COLUMNS,
+        default=DEFAULT_COLUMNS,
+        help="Apenas as colunas selecionadas são calculadas e exportadas.",
+    )
+    compact = st.checkbox(
+        "Tipos compactos (menos memória por linha)",
+        value=False,
+        help="Inteiros de 8/16/32 bits, categorias para nomes e feriados e booleanos anuláveis.",
+    )
+    holiday_bridge = st.checkbox(
+        "Feriados em tabela ponte (DataInt, UF, Feriado, Escopo)",
+        value=False,
+        help="A tabela principal fica só com EhFeriadoNacional e QtdEstadosFeriado.",
+    )
+    medir = st.checkbox(
+        "Medir desempenho por etapa",
+        value=profile_enabled(),
+        help="Tempo e linhas de cada etapa da geração e da exportação.",
+    )
+    medir_memoria = medir and st.checkbox(
+        "Incluir memória alocada (tracemalloc)",
+        value=False,
+        help="Deixa a geração e a exportação várias vezes mais lentas.",
+    )
+
+    if not columns:
+        st.error("Selecione pelo menos uma coluna.")
+        datas_validas = False
+    try:
+        check_business_day_states(columns, final_states)
+    except ValueError as e:
+        st.error(str(e))
+        datas_validas = False
 
     # Botão só funciona se as datas forem válidas
     if datas_validas:
         if st.button("Gerar e Visualizar", use_container_width=True):
-            df = generate_date_dimension(start_date, end_date, config, final_states)
+            cache = st.cache_resource(result_cache)()
+            chave = dimension_cache_key(
+                start_date,
+                end_date,
+                config,
+                final_states,
+                compact,
+                columns,
+                holiday_bridge,
+            )
+            with profiling(medir, trace_memory=medir_memoria) as perfil:
+                df, bridge, hit_tabela = cached_dimension(
+                    cache,
+                    start_date,
+                    end_date,
+                    config,
+                    final_states,
+                    compact=compact,
+                    columns=columns,
+                    holiday_bridge=holiday_bridge,
+                )
+                data_bytes, mime, hit_arquivo = cached_export(
+                    cache, chave, df, fmt, csv_sep, filename, compression, bridge=bridge
+                )
             st.success(f"Tabela gerada com {len(df)} linhas.")
+            if "bytes_por_linha" in df.attrs:
+                mem = df.attrs["bytes_por_linha"]
+                st.caption(
+                    f"Memória: {mem['antes']:.0f} → {mem['depois']:.0f} bytes por linha"
+                )
             st.dataframe(df.head(50), use_container_width=True)
+            if bridge is not None:
+                st.caption(f"Tabela ponte de feriados: {len(bridge)} linhas.")
+                st.dataframe(bridge.head(50), use_container_width=True)
 
-            data_bytes, mime = export_dataframe(df, fmt, csv_sep, filename)
+            st.caption(
+                f"Tabela: {'⚡ cache' if hit_tabela else 'gerada agora'} · "
+                f"Arquivo: {'⚡ cache' if hit_arquivo else 'gerado agora'} · "
+                f"Cache: {len(cache)} itens, "
+                f"{cache.used_bytes / 1024**2:.1f} de {cache.max_bytes / 1024**2:.0f} MB"
+            )
+            file_name = export_file_name(filename, fmt, bridge is not None, compression)
+            if perfil is not None:
+                with st.expander("Desempenho"):
+                    st.caption(
+                        f"{len(df):,} linhas · {file_name}: "
+                        f"{len(data_bytes) / 1024**2:.2f} MB"
+                    )
+                    etapas = pd.DataFrame(perfil.report()["etapas"])
+                    if etapas.empty:
+                        st.caption("Tabela e arquivo vieram do cache: nada foi medido.")
+                    else:
+                        if perfil.trace_memory:
+                            # None (vazio) quando outra sessão media ao mesmo tempo
+                            etapas["allocated_bytes"] = (
+                                etapas["allocated_bytes"].astype(float) / 1024**2
+                            )
+                        else:
+                            etapas = etapas.drop(columns="allocated_bytes")
+                        st.dataframe(
+                            etapas.rename(
+                                columns={
+                                    "name": "Etapa",
+                                    "seconds": "Segundos",
+                                    "rows": "Linhas",
+                                    "allocated_bytes": "Memória alocada (MB)",
+                                }
+                            ),
+                            hide_index=True,
+                            use_container_width=True,
+                        )
             st.download_button(
-                label=f"Baixar arquivo .{fmt}",
+                label=f"Baixar arquivo {file_name}",
                 data=data_bytes,
-                file_name=f"{filename}.{fmt}",
+                file_name=file_name,
                 mime=mime,
                 use_container_width=True,
             )
@@ -0,0 +1,293 @@
+"""Benchmarks da geração e dos exportadores.
+
+Uso: python bench.py [--years 1,10,100,300] [--states 0,1,todos]
+                     [--cases generate,holidays,csv,xlsx,json,sql]
+                     [--repeat 3] [--no-memory] [--output bench.json]
+     python bench.py --compare baseline.json [--threshold 0.25]
+                     [--memory-threshold 0.25] [--min-seconds 0.005]
+
+Cada caso é medido em um intervalo de N anos (a partir de 2000-01-01, ou
+1900-01-01 a partir de 100 anos) com nenhum, um (São Paulo) ou todos os
+Estados. O tempo é a mediana de --repeat execuções; o pico de memória vem de
+uma execução extra com tracemalloc, separada para não distorcer o tempo.
+O rastreamento deixa os exportadores várias vezes mais lentos; --no-memory
+pula essa execução (o pico fica 0 e não entra na comparação).
+
+Com --compare, o resultado é conferido com um arquivo salvo antes: a saída
+é 1 se algum caso ficar mais lento (ou usar mais memória) que o limite.
+Casos abaixo de --min-seconds nos dois lados não contam para o tempo, pois
+ali o ruído domina.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    HOLIDAY_STATES,
+    generate_date_dimension,
+    get_holidays,
+    get_state_holidays,
+    to_csv_bytes,
+    to_json_bytes,
+    to_sql_script,
+    to_xlsx_bytes,
+)
+
+YEAR_SIZES = [1, 10, 100, 300]
+STATE_SETS = ["0", "1", "todos"]
+EXPORTERS = {
+    "csv": to_csv_bytes,
+    "xlsx": to_xlsx_bytes,
+    "json": to_json_bytes,
+    "sql": to_sql_script,
+}
+CASES = ["generate", "holidays"] + list(EXPORTERS)
+CONFIG = {"incluir_carnaval": True, "incluir_corpus": True}
+RESULTS_VERSION = 1
+
+
+class BenchResult(NamedTuple):
+    case: str
+    years: int
+    states: str
+    rows: int
+    seconds: float
+    peak_bytes: int
+    size_bytes: int
+
+
+def bench_range(years: int):
+    inicio = date(2000 if years < 100 else 1900, 1, 1)
+    return inicio, date(inicio.year + years - 1, 12, 31)
+
+
+def bench_states(conjunto: str) -> List[str]:
+    if conjunto == "0":
+        return []
+    if conjunto == "1":
+        return ["São Paulo"]
+    return list(HOLIDAY_STATES)
+
+
+def measure(fn: Callable[[], object], repeat: int, memory: bool = True):
+    # Mediana do tempo em `repeat` execuções e pico de memória em uma execução à parte
+    tempos = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tempos.append(time.perf_counter() - inicio)
+    if not memory:
+        return resultado, statistics.median(tempos), 0
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, statistics.median(tempos), pico
+
+
+def _holidays(inicio: date, fim: date, states: List[str]) -> int:
+    n = 0
+    for ano in range(inicio.year, fim.year + 1):
+        n += len(get_holidays(ano, CONFIG))
+        if states:
+            n += len(get_state_holidays(ano, states))
+    return n
+
+
+def run_benchmarks(
+    years: List[int] = YEAR_SIZES,
+    states: List[str] = STATE_SETS,
+    cases: List[str] = CASES,
+    repeat: int = 3,
+    progress: Optional[Callable[[BenchResult], None]] = None,
+    memory: bool = True,
+) -> List[BenchResult]:
+    resultados = []
+
+    def registrar(case, n_anos, conjunto, rows, seconds, pico, tamanho=0):
+        r = BenchResult(case, n_anos, conjunto, rows, seconds, pico, tamanho)
+        resultados.append(r)
+        if progress:
+            progress(r)
+
+    for n_anos in years:
+        inicio, fim = bench_range(n_anos)
+        for conjunto in states:
+            estados = bench_states(conjunto)
+
+            def gerar():
+                return generate_date_dimension(inicio, fim, CONFIG, estados)
+
+            if "generate" in cases:
+                df, seg, pico = measure(gerar, repeat, memory)
+                registrar("generate", n_anos, conjunto, len(df), seg, pico)
+            elif any(c in EXPORTERS for c in cases):
+                df = gerar()
+            if "holidays" in cases:
+                n, seg, pico = measure(
+                    lambda: _holidays(inicio, fim, estados), repeat, memory
+                )
+                registrar("holidays", n_anos, conjunto, n, seg, pico)
+            for case, exportar in EXPORTERS.items():
+                if case in cases:
+                    data, seg, pico = measure(lambda: exportar(df), repeat, memory)
+                    registrar(case, n_anos, conjunto, len(df), seg, pico, len(data))
+    return resultados
+
+
+def results_document(results: List[BenchResult], repeat: int) -> Dict:
+    return {
+        "versao": RESULTS_VERSION,
+        "quando": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+        },
+        "repeat": repeat,
+        "resultados": [r._asdict() for r in results],
+    }
+
+
+def _key(r: Dict):
+    return r["case"], r["years"], r["states"]
+
+
+def compare_results(
+    atual: List[Dict],
+    base: List[Dict],
+    threshold: float = 0.25,
+    memory_threshold: float = 0.25,
+    min_seconds: float = 0.005,
+) -> List[str]:
+    # Regressões (texto) de cada caso presente nos dois resultados
+    anteriores = {_key(r): r for r in base}
+    regressoes = []
+    for r in atual:
+        b = anteriores.get(_key(r))
+        if b is None:
+            continue
+        rotulo = f"{r['case']} {r['years']} anos, estados={r['states']}"
+        lento = max(r["seconds"], b["seconds"]) >= min_seconds
+        if lento and r["seconds"] > b["seconds"] * (1 + threshold):
+            # Base zerada (possível com min_seconds=0): sem variação percentual
+            variacao = (
+                f"+{r['seconds'] / b['seconds'] - 1:.0%}" if b["seconds"] else "n/a"
+            )
+            regressoes.append(
+                f"{rotulo}: {b['seconds']:.4f}s -> {r['seconds']:.4f}s ({variacao})"
+            )
+        medido = b["peak_bytes"] and r["peak_bytes"]
+        if medido and r["peak_bytes"] > b["peak_bytes"] * (1 + memory_threshold):
+            regressoes.append(
+                f"{rotulo}: pico {b['peak_bytes']:,} -> {r['peak_bytes']:,} bytes "
+                f"(+{r['peak_bytes'] / b['peak_bytes'] - 1:.0%})"
+            )
+    return regressoes
+
+
+def format_result(r: BenchResult) -> str:
+    return (
+        f"{r.case:<9} {r.years:>4} anos  estados={r.states:<6} {r.rows:>8} linhas "
+        f"{r.seconds:>9.4f}s  pico {r.peak_bytes / 2**20:>8.1f} MB"
+        + (f"  {r.size_bytes / 2**20:>8.1f} MB gerados" if r.size_bytes else "")
+    )
+
+
+def _csv_list(valor: str) -> List[str]:
+    return [v.strip() for v in valor.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Mede tempo e pico de memória da geração e dos exportadores."
+    )
+    parser.add_argument("--years", default=",".join(map(str, YEAR_SIZES)))
+    parser.add_argument("--states", default=",".join(STATE_SETS))
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Não mede o pico de memória (tracemalloc deixa a execução mais lenta)",
+    )
+    parser.add_argument("--output", type=Path, help="Grava os resultados em JSON")
+    parser.add_argument("--compare", type=Path, help="Resultados salvos de referência")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Aumento de tempo tolerado (0.25 = 25%%)",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.25,
+        help="Aumento do pico de memória tolerado",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=0.005,
+        help="Casos mais rápidos que isso não contam para o tempo",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        years = [int(v) for v in _csv_list(args.years)]
+    except ValueError:
+        parser.error("--years deve ser uma lista de inteiros")
+    states = _csv_list(args.states)
+    cases = _csv_list(args.cases)
+    if not set(states) <= set(STATE_SETS):
+        parser.error(f"--states aceita {', '.join(STATE_SETS)}")
+    if not set(cases) <= set(CASES):
+        parser.error(f"--cases aceita {', '.join(CASES)}")
+    if args.repeat < 1:
+        parser.error("--repeat deve ser maior que zero")
+
+    results = run_benchmarks(
+        years,
+        states,
+        cases,
+        args.repeat,
+        progress=lambda r: print(format_result(r), flush=True),
+        memory=not args.no_memory,
+    )
+    documento = results_document(results, args.repeat)
+    if args.output:
+        args.output.write_text(
+            json.dumps(documento, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+    if args.compare:
+        base = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressoes = compare_results(
+            documento["resultados"],
+            base["resultados"],
+            args.threshold,
+            args.memory_threshold,
+            args.min_seconds,
+        )
+        for regressao in regressoes:
+            print(f"REGRESSÃO {regressao}", file=sys.stderr)
+        print(f"{len(regressoes)} regressões em relação a {args.compare}")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,440 @@
+"""Geração em lote, sem interface.
+
+Uso: python cli.py lote.toml [--workers N] [--output-dir DIR] [--summary-json ARQ]
+                           [--store DIR] [--profile [tempo]]
+     python cli.py --build-store DIR | --validate-store DIR
+     python cli.py --extend ARQ | --last-date AAAA-MM-DD  --until AAAA-MM-DD
+                   [--format sql --dialect postgres] [--states ...] [--config ...]
+
+O lote é um arquivo TOML ou JSON com uma lista de jobs (e, opcionalmente,
+valores padrão compartilhados):
+
+    [defaults]
+    start = 2024-01-01
+    end = 2030-12-31
+    formats = ["csv", "parquet"]
+
+    [[jobs]]
+    filename = "dCalendario"
+    states = "todos"
+    split_states = true
+
+Jobs que só diferem no formato de exportação compartilham uma única geração
+da tabela (e do cálculo de feriados).
+
+Com --profile, cada tabela gerada registra em stderr uma linha JSON com o
+tempo, as linhas e a memória alocada de cada etapa (--profile tempo dispensa
+a medição de memória, que deixa a exportação mais lenta).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app import (
+    DELTA_FORMATS,
+    EXPORT_FORMATS,
+    HOLIDAY_STATES,
+    PROFILE_ENV,
+    PROFILE_TIME_ONLY,
+    SQL_DIALECTS,
+    STORE_ENV,
+    UF_SIGLAS,
+    build_calendar_store,
+    check_business_day_states,
+    dimension_cache_key,
+    export_delta,
+    export_file_name,
+    generate_date_dimension,
+    generate_holiday_bridge,
+    plan_increment,
+    profiling,
+    read_dimension,
+    use_calendar_store,
+    validate_calendar_store,
+    write_export,
+)
+
+JOB_KEYS = {
+    "start",
+    "end",
+    "config",
+    "states",
+    "split_states",
+    "columns",
+    "compact",
+    "holiday_bridge",
+    "format",
+    "formats",
+    "filename",
+    "csv_sep",
+    "compression",
+    "output_dir",
+}
+ALL_STATES = "todos"
+
+
+class ExportJob(NamedTuple):
+    fmt: str
+    filename: str
+    csv_sep: str
+    compression: Optional[str]
+    path: Path
+
+
+class DimensionTask(NamedTuple):
+    start: date
+    end: date
+    config: Dict[str, bool]
+    states: Tuple[str, ...]
+    compact: bool
+    columns: Optional[Tuple[str, ...]]
+    holiday_bridge: bool
+    exports: Tuple[ExportJob, ...]
+
+
+class JobResult(NamedTuple):
+    path: str
+    fmt: str
+    rows: int
+    generation_seconds: float
+    export_seconds: float
+    size_bytes: int
+    error: Optional[str] = None
+
+
+def load_spec(path: Path) -> Dict:
+    with open(path, "rb") as f:
+        spec = tomllib.load(f) if path.suffix == ".toml" else json.load(f)
+    if isinstance(spec, list):
+        spec = {"jobs": spec}
+    if not isinstance(spec.get("jobs"), list) or not spec["jobs"]:
+        raise ValueError("O lote deve ter uma lista 'jobs' não vazia.")
+    return spec
+
+
+def _as_date(valor) -> date:
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor))
+
+
+def _job_states(valor) -> List[str]:
+    if valor in (None, []):
+        return []
+    if valor == ALL_STATES:
+        return list(HOLIDAY_STATES)
+    if isinstance(valor, str):
+        valor = [valor]
+    invalidos = [s for s in valor if s not in UF_SIGLAS]
+    if invalidos:
+        raise ValueError(f"Estados inválidos: {', '.join(invalidos)}.")
+    return list(valor)
+
+
+def expand_jobs(spec: Dict, output_dir: Optional[Path] = None) -> List[DimensionTask]:
+    # Agrupa as exportações por tabela: cada grupo vira uma única geração
+    grupos: Dict[Tuple, Tuple[Dict, List[ExportJob]]] = {}
+    caminhos = set()
+    for n, job in enumerate(spec["jobs"], start=1):
+        job = {**spec.get("defaults", {}), **job}
+        desconhecidas = sorted(set(job) - JOB_KEYS)
+        if desconhecidas:
+            raise ValueError(f"Job {n}: chaves inválidas: {', '.join(desconhecidas)}.")
+        if "start" not in job or "end" not in job:
+            raise ValueError(f"Job {n}: 'start' e 'end' são obrigatórios.")
+        formatos = job.get("formats") or [job.get("format", "csv")]
+        invalidos = [f for f in formatos if f.lower() not in EXPORT_FORMATS]
+        if invalidos:
+            raise ValueError(f"Job {n}: formatos inválidos: {', '.join(invalidos)}.")
+
+        estados = _job_states(job.get("states"))
+        filename = job.get("filename", "dCalendario")
+        variantes = (
+            [([s], f"{filename}_{UF_SIGLAS[s]}") for s in estados]
+            if job.get("split_states")
+            else [(estados, filename)]
+        )
+        destino = Path(output_dir or job.get("output_dir", "."))
+        for estados_job, nome in variantes:
+            params = {
+                "start": _as_date(job["start"]),
+                "end": _as_date(job["end"]),
+                "config": dict(job.get("config", {})),
+                "states": tuple(estados_job),
+                "compact": bool(job.get("compact", False)),
+                "columns": tuple(job["columns"]) if "columns" in job else None,
+                "holiday_bridge": bool(job.get("holiday_bridge", False)),
+            }
+            if params["start"] > params["end"]:
+                raise ValueError(f"Job {n}: 'start' maior que 'end'.")
+            try:
+                check_business_day_states(params["columns"] or [], estados_job)
+            except ValueError as e:
+                raise ValueError(f"Job {n}: {e}") from None
+            chave = dimension_cache_key(
+                params["start"],
+                params["end"],
+                params["config"],
+                list(params["states"]),
+                params["compact"],
+                params["columns"],
+                params["holiday_bridge"],
+            )
+            _, exports = grupos.setdefault(chave, (params, []))
+            for fmt in formatos:
+                fmt = fmt.lower()
+                compression = job.get("compression")
+                caminho = destino / export_file_name(
+                    nome, fmt, params["holiday_bridge"], compression
+                )
+                if caminho in caminhos:
+                    raise ValueError(f"Job {n}: arquivo repetido no lote: {caminho}.")
+                caminhos.add(caminho)
+                exports.append(
+                    ExportJob(fmt, nome, job.get("csv_sep", ";"), compression, caminho)
+                )
+    return [
+        DimensionTask(exports=tuple(exports), **params)
+        for params, exports in grupos.values()
+    ]
+
+
+def run_task(task: DimensionTask) -> List[JobResult]:
+    # Com CALENDARIO_PERFIL ligado (herdado pelos processos), uma linha JSON por tabela
+    with profiling() as perfil:
+        resultados = _run_task(task)
+    if perfil is not None:
+        linha = perfil.log_line(
+            inicio=task.start,
+            fim=task.end,
+            estados=len(task.states),
+            arquivos=[r.path for r in resultados],
+        )
+        print(linha, file=sys.stderr, flush=True)
+    return resultados
+
+
+def _run_task(task: DimensionTask) -> List[JobResult]:
+    inicio = time.perf_counter()
+    try:
+        df = generate_date_dimension(
+            task.start,
+            task.end,
+            task.config,
+            list(task.states),
+            compact=task.compact,
+            columns=list(task.columns) if task.columns is not None else None,
+            holiday_bridge=task.holiday_bridge,
+        )
+        bridge = None
+        if task.holiday_bridge:
+            bridge = generate_holiday_bridge(
+                task.start, task.end, task.config, list(task.states), task.compact
+            )
+    except Exception as exc:
+        erro = f"{type(exc).__name__}: {exc}"
+        return [
+            JobResult(str(e.path), e.fmt, 0, 0.0, 0.0, 0, erro) for e in task.exports
+        ]
+    geracao = time.perf_counter() - inicio
+
+    resultados = []
+    for export in task.exports:
+        inicio = time.perf_counter()
+        try:
+            export.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(export.path, "wb") as sink:
+                write_export(
+                    sink,
+                    df,
+                    export.fmt,
+                    export.csv_sep,
+                    export.filename,
+                    export.compression,
+                    bridge,
+                )
+            tamanho, erro = export.path.stat().st_size, None
+        except Exception as exc:
+            tamanho, erro = 0, f"{type(exc).__name__}: {exc}"
+        resultados.append(
+            JobResult(
+                str(export.path),
+                export.fmt,
+                len(df),
+                geracao,
+                time.perf_counter() - inicio,
+                tamanho,
+                erro,
+            )
+        )
+    return resultados
+
+
+def run_batch(
+    tasks: List[DimensionTask], workers: Optional[int] = None
+) -> List[JobResult]:
+    if workers == 1 or len(tasks) == 1:
+        return [r for task in tasks for r in run_task(task)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [r for resultados in pool.map(run_task, tasks) for r in resultados]
+
+
+def format_summary(results: List[JobResult]) -> str:
+    linhas = [
+        f"{'arquivo':<48} {'formato':<9} {'linhas':>8} {'geração':>9} "
+        f"{'export.':>9} {'tamanho':>12}"
+    ]
+    for r in results:
+        if r.error:
+            linhas.append(f"{r.path:<48} {r.fmt:<9} ERRO {r.error}")
+            continue
+        linhas.append(
+            f"{r.path:<48} {r.fmt:<9} {r.rows:>8} {r.generation_seconds:>8.2f}s "
+            f"{r.export_seconds:>8.2f}s {r.size_bytes:>12,}"
+        )
+    total = sum(r.size_bytes for r in results)
+    erros = sum(1 for r in results if r.error)
+    linhas.append(f"{len(results)} arquivos, {total:,} bytes, {erros} com erro")
+    return "\n".join(linhas)
+
+
+def run_extend(args: argparse.Namespace) -> int:
+    # Gera só o intervalo que falta e as linhas cujos feriados mudaram
+    config = dict.fromkeys(args.config or [], True)
+    states = _job_states(
+        args.states if args.states in (None, ALL_STATES) else args.states.split(",")
+    )
+    existing = None
+    if args.extend:
+        existing = read_dimension(args.extend, csv_sep=args.csv_sep)
+    # Sem --format, o delta sai no formato da origem (um banco .db recebe SQL)
+    fmt = args.format or (args.extend.suffix.lstrip(".") if args.extend else "csv")
+    if fmt not in DELTA_FORMATS:
+        fmt = "sql"
+    plan = plan_increment(
+        _as_date(args.until),
+        config,
+        states,
+        existing=existing,
+        last_date=_as_date(args.last_date) if args.last_date else None,
+    )
+    data, _, nome = export_delta(plan, fmt, args.csv_sep, args.filename, args.dialect)
+    destino = (args.output_dir or Path(".")) / nome
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_bytes(data)
+
+    print(f"Última data existente: {plan.last_date}")
+    print(f"Linhas novas: {len(plan.new_rows)}")
+    print(f"Linhas alteradas: {len(plan.changed_rows)}")
+    for coluna, n in plan.changed_columns.items():
+        print(f"  {coluna}: {n}")
+    print(f"Delta gravado em {destino} ({len(data):,} bytes)")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Gera tabelas dimensão de data em lote, sem a interface."
+    )
+    parser.add_argument(
+        "spec", type=Path, nargs="?", help="Lote de jobs (.toml ou .json)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Processos em paralelo (padrão: número de CPUs)",
+    )
+    parser.add_argument(
+        "--output-dir", type=Path, help="Pasta de saída (sobrepõe a do lote)"
+    )
+    parser.add_argument(
+        "--summary-json", type=Path, help="Grava o resumo por arquivo em JSON"
+    )
+    parser.add_argument(
+        "--store", type=Path, help="Usa o armazém pré-calculado desta pasta"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="1",
+        choices=["1", PROFILE_TIME_ONLY],
+        help="Linha JSON por tabela em stderr com o desempenho de cada etapa",
+    )
+    parser.add_argument(
+        "--build-store", type=Path, help="Gera o armazém pré-calculado e sai"
+    )
+    parser.add_argument(
+        "--validate-store",
+        type=Path,
+        help="Reconstrói o armazém e confere com o cálculo ao vivo",
+    )
+    incremental = parser.add_argument_group("extensão incremental")
+    incremental.add_argument(
+        "--extend", type=Path, help="Tabela existente (.csv, .parquet, .sql ou .db)"
+    )
+    incremental.add_argument("--last-date", help="Última data já carregada")
+    incremental.add_argument("--until", help="Nova data final")
+    incremental.add_argument("--format", choices=DELTA_FORMATS, help="Formato do delta")
+    incremental.add_argument("--dialect", choices=SQL_DIALECTS, default="ansi")
+    incremental.add_argument(
+        "--states", help="Estados separados por vírgula, ou 'todos'"
+    )
+    incremental.add_argument(
+        "--config", action="append", help="Feriado opcional (ex.: incluir_carnaval)"
+    )
+    incremental.add_argument("--filename", default="dCalendario")
+    incremental.add_argument("--csv-sep", default=";")
+    args = parser.parse_args(argv)
+
+    if args.extend or args.last_date:
+        if not args.until:
+            parser.error("--until é obrigatório na extensão incremental")
+        try:
+            return run_extend(args)
+        except (OSError, ValueError) as exc:
+            print(f"Extensão inválida: {exc}", file=sys.stderr)
+            return 2
+    if args.build_store:
+        build_calendar_store(args.build_store)
+        print(f"Armazém gerado em {args.build_store}")
+        return 0
+    if args.validate_store:
+        problemas = validate_calendar_store(args.validate_store)
+        for problema in problemas:
+            print(problema, file=sys.stderr)
+        print("Armazém inválido." if problemas else "Armazém confere.")
+        return 1 if problemas else 0
+    if args.spec is None:
+        parser.error("informe o lote de jobs")
+    if args.store:
+        # Os processos filhos herdam a variável e abrem o mesmo armazém mapeado
+        use_calendar_store(args.store)
+        os.environ[STORE_ENV] = str(args.store)
+    if args.profile:
+        os.environ[PROFILE_ENV] = args.profile
+
+    try:
+        tasks = expand_jobs(load_spec(args.spec), args.output_dir)
+    except (OSError, ValueError, tomllib.TOMLDecodeError) as exc:
+        print(f"Lote inválido: {exc}", file=sys.stderr)
+        return 2
+
+    results = run_batch(tasks, args.workers)
+    print(format_summary(results))
+    if args.summary_json:
+        args.summary_json.write_text(
+            json.dumps([r._asdict() for r in results], ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    return 1 if any(r.error for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
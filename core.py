@@ -0,0 +1,712 @@
+"""Feriados e aritmética de calendário, sem pandas nem interface.
+
+Só depende de numpy e da biblioteca padrão, para que scripts, testes e
+workers que precisam apenas de easter_sunday, get_holidays ou dos dias úteis
+não paguem a importação do Streamlit e dos exportadores. app.py reexporta
+tudo daqui.
+"""
+
+import json
+import os
+import re
+import tomllib
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+# --- CÁLCULO DE PÁSCOA ---
+def easter_sundays(years: np.ndarray) -> np.ndarray:
+    # Mesmo algoritmo de easter_sunday, aplicado a um array de anos de uma vez
+    year = np.asarray(years, dtype=np.int64)
+    a = year % 19
+    b = year // 100
+    c = year % 100
+    d = b // 4
+    e = b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i = c // 4
+    k = c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    n = (h + l - 7 * m + 114) // 31
+    o = (h + l - 7 * m + 114) % 31
+    return _days_from_civil(year, n, o + 1).astype("datetime64[D]")
+
+
+def easter_sunday(year: int) -> date:
+    return easter_sundays(np.array([year]))[0].astype(date)
+
+
+# --- REGRAS DE FERIADOS ---
+# As regras ficam em feriados.toml (ou no arquivo indicado por CALENDARIO_FERIADOS)
+HOLIDAY_RULES_FILE = Path(__file__).with_name("feriados.toml")
+RULES_ENV = "CALENDARIO_FERIADOS"
+NATIONAL = "BR"
+UF_SIGLAS = {
+    "Acre": "AC",
+    "Alagoas": "AL",
+    "Amapá": "AP",
+    "Amazonas": "AM",
+    "Bahia": "BA",
+    "Ceará": "CE",
+    "Distrito Federal": "DF",
+    "Espírito Santo": "ES",
+    "Goiás": "GO",
+    "Maranhão": "MA",
+    "Mato Grosso": "MT",
+    "Mato Grosso do Sul": "MS",
+    "Minas Gerais": "MG",
+    "Pará": "PA",
+    "Paraíba": "PB",
+    "Paraná": "PR",
+    "Pernambuco": "PE",
+    "Piauí": "PI",
+    "Rio de Janeiro": "RJ",
+    "Rio Grande do Norte": "RN",
+    "Rio Grande do Sul": "RS",
+    "Rondônia": "RO",
+    "Roraima": "RR",
+    "Santa Catarina": "SC",
+    "São Paulo": "SP",
+    "Sergipe": "SE",
+    "Tocantins": "TO",
+}
+
+DIAS_SEMANA_REGRA = {
+    "segunda": 0,
+    "terça": 1,
+    "quarta": 2,
+    "quinta": 3,
+    "sexta": 4,
+    "sábado": 5,
+    "domingo": 6,
+}
+_RULE_KEYS = {"nome", "data", "pascoa", "mes", "dia_semana", "ordem", "opcao"}
+_RULE_KEYS |= {"desde", "ate"}
+_FIXED, _EASTER, _NTH_WEEKDAY = 0, 1, 2
+
+
+class HolidayRule(NamedTuple):
+    holiday: str
+    mes: int = 0  # 0 = regra relativa ao Domingo de Páscoa
+    dia: int = 0
+    offset: int = 0  # dias em relação ao Domingo de Páscoa
+    config: Optional[str] = None  # chave do config que habilita o feriado
+    ordem: int = 0  # n-ésimo dia_semana do mês (-1 = último); 0 = data fixa
+    dia_semana: int = 0  # 0 = segunda ... 6 = domingo
+    desde: Optional[int] = None  # primeiro ano de vigência
+    ate: Optional[int] = None  # último ano de vigência
+
+
+class Municipality(NamedTuple):
+    nome: str
+    uf: str
+    rules: List[HolidayRule]
+
+
+class RuleRegistry(NamedTuple):
+    national: List[HolidayRule]
+    states: Dict[str, List[HolidayRule]]
+    municipalities: Dict[str, Municipality]  # por código IBGE
+    table: dict  # todas as regras compiladas em arrays
+    index: Dict[str, Tuple[int, int]]  # jurisdição -> faixa de linhas da tabela
+
+
+def _parse_rule(d: dict, onde: str, permite_opcao: bool) -> HolidayRule:
+    if not isinstance(d, dict):
+        raise ValueError(f"{onde}: a regra deve ser uma tabela.")
+    desconhecidas = sorted(set(d) - _RULE_KEYS)
+    if desconhecidas:
+        raise ValueError(f"{onde}: chaves inválidas: {', '.join(desconhecidas)}.")
+    nome = d.get("nome")
+    if not isinstance(nome, str) or not nome.strip():
+        raise ValueError(f"{onde}: 'nome' é obrigatório.")
+    onde = f"{onde} ({nome})"
+    tipos = [k for k in ("data", "pascoa", "mes") if k in d]
+    if len(tipos) != 1:
+        raise ValueError(f"{onde}: use exatamente um de 'data', 'pascoa' ou 'mes'.")
+
+    campos = {}
+    if "data" in d:
+        m = re.fullmatch(r"(\d{2})-(\d{2})", str(d["data"]))
+        try:
+            # Ano não bissexto: 29/02 não existe todo ano e é recusado
+            date(2001, int(m[1]), int(m[2]))
+        except (TypeError, ValueError):
+            raise ValueError(f"{onde}: 'data' deve ser uma data válida MM-DD.")
+        campos.update(mes=int(m[1]), dia=int(m[2]))
+    elif "pascoa" in d:
+        # A Páscoa cai entre 22/03 e 25/04: com -80 a 250 a data fica no mesmo ano
+        if not isinstance(d["pascoa"], int) or not -80 <= d["pascoa"] <= 250:
+            raise ValueError(f"{onde}: 'pascoa' deve ser um inteiro de -80 a 250.")
+        campos.update(offset=d["pascoa"])
+    else:
+        if d["mes"] not in range(1, 13):
+            raise ValueError(f"{onde}: 'mes' deve ir de 1 a 12.")
+        if d.get("dia_semana") not in DIAS_SEMANA_REGRA:
+            raise ValueError(
+                f"{onde}: 'dia_semana' deve ser um de {', '.join(DIAS_SEMANA_REGRA)}."
+            )
+        if d.get("ordem") not in (1, 2, 3, 4, -1):
+            raise ValueError(f"{onde}: 'ordem' deve ser 1, 2, 3, 4 ou -1.")
+        campos.update(
+            mes=d["mes"],
+            ordem=d["ordem"],
+            dia_semana=DIAS_SEMANA_REGRA[d["dia_semana"]],
+        )
+
+    for k in ("desde", "ate"):
+        if k in d and not isinstance(d[k], int):
+            raise ValueError(f"{onde}: '{k}' deve ser um ano.")
+    if d.get("desde", -np.inf) > d.get("ate", np.inf):
+        raise ValueError(f"{onde}: 'desde' maior que 'ate'.")
+    if "opcao" in d and not permite_opcao:
+        raise ValueError(f"{onde}: 'opcao' só vale para feriados nacionais.")
+    return HolidayRule(
+        nome,
+        config=d.get("opcao"),
+        desde=d.get("desde"),
+        ate=d.get("ate"),
+        **campos,
+    )
+
+
+def _parse_rules(bloco, onde: str, permite_opcao: bool = False) -> List[HolidayRule]:
+    regras = (bloco or {}).get("regras")
+    if not isinstance(regras, list):
+        raise ValueError(f"{onde}: 'regras' deve ser uma lista.")
+    return [
+        _parse_rule(r, f"{onde}, regra {i}", permite_opcao)
+        for i, r in enumerate(regras, 1)
+    ]
+
+
+def _compile_registry(
+    national: List[HolidayRule],
+    states: Dict[str, List[HolidayRule]],
+    municipalities: Dict[str, Municipality],
+) -> Tuple[dict, Dict[str, Tuple[int, int]]]:
+    # Uma única tabela, com as regras de cada jurisdição em linhas contíguas
+    grupos = [(NATIONAL, None, national)]
+    grupos += [(s, s, r) for s, r in states.items()]
+    grupos += [(c, f"{m.nome}/{m.uf}", m.rules) for c, m in municipalities.items()]
+    regras, rotulos, index = [], [], {}
+    for chave, rotulo, lista in grupos:
+        index[chave] = (len(regras), len(regras) + len(lista))
+        if chave != NATIONAL and rotulo != chave:
+            index[rotulo] = index[chave]  # município também pelo nome: "Recife/PE"
+        regras += lista
+        rotulos += [rotulo] * len(lista)
+    tipo = [
+        _EASTER if r.mes == 0 else _NTH_WEEKDAY if r.ordem else _FIXED for r in regras
+    ]
+    tabela = {
+        "holiday": np.array([r.holiday for r in regras], dtype=object),
+        "tipo": np.array(tipo, dtype=np.int64),
+        "mes": np.array([r.mes for r in regras], dtype=np.int64),
+        "dia": np.array([r.dia for r in regras], dtype=np.int64),
+        "offset": np.array([r.offset for r in regras], dtype=np.int64),
+        "ordem": np.array([r.ordem for r in regras], dtype=np.int64),
+        "dia_semana": np.array([r.dia_semana for r in regras], dtype=np.int64),
+        "desde": np.array([r.desde or -(10**6) for r in regras], dtype=np.int64),
+        "ate": np.array([r.ate or 10**6 for r in regras], dtype=np.int64),
+        "config": np.array([r.config for r in regras], dtype=object),
+        "estado": np.array(rotulos, dtype=object),
+    }
+    return tabela, index
+
+
+def load_holiday_rules(path) -> RuleRegistry:
+    # Lê (.toml ou .json), valida e compila as regras em uma tabela só
+    path = Path(path)
+    with open(path, "rb") as f:
+        dados = tomllib.load(f) if path.suffix == ".toml" else json.load(f)
+    if dados.get("versao") != 1:
+        raise ValueError(f"{path}: 'versao' deve ser 1.")
+
+    national = _parse_rules(dados.get("nacional"), "nacional", permite_opcao=True)
+    states = {}
+    for nome, bloco in dados.get("estados", {}).items():
+        if nome not in UF_SIGLAS:
+            raise ValueError(f"{path}: Estado desconhecido: {nome}.")
+        states[nome] = _parse_rules(bloco, nome)
+    municipalities = {}
+    for codigo, bloco in dados.get("municipios", {}).items():
+        if not re.fullmatch(r"\d{7}", codigo):
+            raise ValueError(f"{path}: código IBGE inválido: {codigo}.")
+        if bloco.get("uf") not in UF_SIGLAS.values() or not bloco.get("nome"):
+            raise ValueError(f"{path}: município {codigo} precisa de 'nome' e 'uf'.")
+        municipalities[codigo] = Municipality(
+            bloco["nome"], bloco["uf"], _parse_rules(bloco, codigo)
+        )
+    tabela, index = _compile_registry(national, states, municipalities)
+    return RuleRegistry(national, states, municipalities, tabela, index)
+
+
+# Compiladas uma única vez, na carga do módulo
+HOLIDAY_RULES = load_holiday_rules(os.environ.get(RULES_ENV) or HOLIDAY_RULES_FILE)
+NATIONAL_RULES = HOLIDAY_RULES.national
+STATE_RULES = HOLIDAY_RULES.states
+MUNICIPAL_RULES = HOLIDAY_RULES.municipalities
+# Estados com feriados no arquivo de regras: a lista de "todos" da interface e dos serviços
+HOLIDAY_STATES = [s for s in UF_SIGLAS if s in STATE_RULES]
+
+
+def _nth_weekday(
+    years: np.ndarray, mes: np.ndarray, dia_semana: np.ndarray, ordem: np.ndarray
+) -> np.ndarray:
+    # n-ésimo dia da semana do mês; ordem -1 conta a partir do fim do mês
+    primeiro = _days_from_civil(years, mes, 1)
+    proximo = _days_from_civil(years + mes // 12, mes % 12 + 1, 1)
+    ultimo = proximo - 1
+    # (dias + 3) % 7: segunda = 0, pois 1970-01-01 foi uma quinta
+    do_inicio = primeiro + (dia_semana - (primeiro + 3) % 7) % 7 + 7 * (ordem - 1)
+    do_fim = ultimo - ((ultimo + 3) % 7 - dia_semana) % 7
+    return np.where(ordem > 0, do_inicio, do_fim)
+
+
+def _evaluate_rules(
+    tabela: dict, linhas: np.ndarray, years: np.ndarray, easter: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Matriz (regras x anos), achatada regra a regra, sem os anos fora da vigência
+    col = {k: v[linhas][:, None] for k, v in tabela.items()}
+    anos = years[None, :]
+    mes = np.maximum(col["mes"], 1)
+    fixos = _days_from_civil(anos, mes, np.maximum(col["dia"], 1))
+    moveis = easter[None, :] + col["offset"]
+    semanais = _nth_weekday(anos, mes, col["dia_semana"], col["ordem"])
+    dias = np.select(
+        [col["tipo"] == _EASTER, col["tipo"] == _NTH_WEEKDAY], [moveis, semanais], fixos
+    )
+    vigente = (anos >= col["desde"]) & (anos <= col["ate"])
+    forma = dias.shape
+    return (
+        dias[vigente].astype("datetime64[D]"),
+        np.broadcast_to(col["holiday"], forma)[vigente],
+        np.broadcast_to(col["estado"], forma)[vigente],
+    )
+
+
+def holiday_dates(
+    start_year: int,
+    end_year: int,
+    config: Optional[dict] = None,
+    states: Optional[List[str]] = None,
+    include_national: bool = True,
+    municipalities: Optional[List[str]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Todos os feriados do intervalo de anos: (datas datetime64[D], nomes, jurisdições)
+    # Feriados nacionais têm jurisdição None; municipais, "Nome/UF".
+    # Municípios aceitam o código IBGE ou o rótulo "Nome/UF".
+    config = config or {}
+    tabela, index = HOLIDAY_RULES.table, HOLIDAY_RULES.index
+    years = np.arange(start_year, end_year + 1, dtype=np.int64)
+    easter = easter_sundays(years).astype(np.int64)
+    partes = []
+    if include_national:
+        linhas = np.arange(*index[NATIONAL])
+        opcoes = tabela["config"][linhas]
+        partes.append(
+            linhas[np.array([c is None or bool(config.get(c)) for c in opcoes], bool)]
+        )
+    for chave in list(states or []) + list(municipalities or []):
+        if chave in index and chave != NATIONAL:
+            partes.append(np.arange(*index[chave]))
+    linhas = np.concatenate(partes) if partes else np.array([], dtype=np.int64)
+    if not len(linhas):
+        vazio = np.array([], dtype=object)
+        return np.array([], dtype="datetime64[D]"), vazio, vazio
+    return _evaluate_rules(tabela, linhas, years, easter)
+
+
+# --- LÓGICA DE FERIADOS ---
+def get_holidays(year: int, config: dict) -> List[Dict]:
+    datas, nomes, _ = holiday_dates(year, year, config)
+    return [{"date": d, "holiday": h} for d, h in zip(datas.astype(object), nomes)]
+
+
+def get_state_holidays(year: int, selected_states: List[str]) -> List[Dict]:
+    datas, nomes, estados = holiday_dates(
+        year, year, states=selected_states, include_national=False
+    )
+    return [
+        {"date": d, "holiday": h, "Estado": e}
+        for d, h, e in zip(datas.astype(object), nomes, estados)
+    ]
+
+
+def get_municipal_holidays(year: int, municipalities: List[str]) -> List[Dict]:
+    datas, nomes, municipios = holiday_dates(
+        year, year, include_national=False, municipalities=municipalities
+    )
+    return [
+        {"date": d, "holiday": h, "Municipio": m}
+        for d, h, m in zip(datas.astype(object), nomes, municipios)
+    ]
+
+
+# --- NOMES DE DIAS E MESES ---
+DIAS_PT = {
+    1: "Domingo",
+    2: "Segunda-feira",
+    3: "Terça-feira",
+    4: "Quarta-feira",
+    5: "Quinta-feira",
+    6: "Sexta-feira",
+    7: "Sábado",
+}
+MESES_PT = {
+    1: "Janeiro",
+    2: "Fevereiro",
+    3: "Março",
+    4: "Abril",
+    5: "Maio",
+    6: "Junho",
+    7: "Julho",
+    8: "Agosto",
+    9: "Setembro",
+    10: "Outubro",
+    11: "Novembro",
+    12: "Dezembro",
+}
+
+# --- MOTOR DE COLUNAS (ARITMÉTICA INTEIRA SOBRE OS DIAS) ---
+_NOMES_DIAS = np.array(list(DIAS_PT.values()), dtype=object)
+_NOMES_MESES = np.array(list(MESES_PT.values()), dtype=object)
+EXCEL_EPOCH_OFFSET = 25569  # dias entre 1899-12-30 e 1970-01-01
+
+
+def civil_from_days(dias: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Dias desde 1970-01-01 -> (ano, mês, dia), calendário gregoriano proléptico
+    z = dias + 719468
+    era = np.floor_divide(z, 146097)
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    dia = doy - (153 * mp + 2) // 5 + 1
+    mes = np.where(mp < 10, mp + 3, mp - 9)
+    ano = yoe + era * 400 + (mes <= 2)
+    return ano, mes, dia
+
+
+def _days_from_civil(ano: np.ndarray, mes: np.ndarray, dia: np.ndarray) -> np.ndarray:
+    y = ano - (mes <= 2)
+    era = np.floor_divide(y, 400)
+    yoe = y - era * 400
+    mp = np.where(mes > 2, mes - 3, mes + 9)
+    doy = (153 * mp + 2) // 5 + dia - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _iso_weeks_in_year(ano: np.ndarray) -> np.ndarray:
+    def p(y):
+        return (y + y // 4 - y // 100 + y // 400) % 7
+
+    return np.where((p(ano) == 4) | (p(ano - 1) == 3), 53, 52)
+
+
+# Cada coluna (ou valor intermediário, prefixo "_") declara as dependências e a
+# função que a constrói a partir delas; só o necessário é calculado.
+_COLUMN_BUILDERS: Dict[str, Tuple[Tuple[str, ...], Callable]] = {}
+
+
+def _column(name: str, *deps: str):
+    def register(fn):
+        _COLUMN_BUILDERS[name] = (deps, fn)
+        return fn
+
+    return register
+
+
+@_column("_civil", "_dias")
+def _build_civil(dias):
+    return civil_from_days(dias)
+
+
+@_column("_dow", "_dias")
+def _build_dow(dias):
+    return (dias + 3) % 7  # 0 = Segunda-feira (1970-01-01 foi uma Quinta-feira)
+
+
+@_column("_doy", "_dias", "_civil")
+def _build_doy(dias, civil):
+    ano, mes, dia = civil
+    return dias - _days_from_civil(ano, np.ones_like(mes), np.ones_like(dia)) + 1
+
+
+@_column("_dia_semana", "_dow")
+def _build_dia_semana(dow):
+    return (dow + 1) % 7 + 1  # 1 = Domingo
+
+
+@_column("Ano", "_civil")
+def _build_ano(civil):
+    return civil[0].astype(np.int32)
+
+
+@_column("Mes", "_civil")
+def _build_mes(civil):
+    return civil[1].astype(np.int32)
+
+
+@_column("DiaDoMes", "_civil")
+def _build_dia_do_mes(civil):
+    return civil[2].astype(np.int32)
+
+
+@_column("DiaDoAno", "_doy")
+def _build_dia_do_ano(doy):
+    return doy.astype(np.int32)
+
+
+@_column("DiaSemana", "_dia_semana")
+def _build_dia_semana_col(dia_semana):
+    return dia_semana.astype(np.int32)
+
+
+@_column("NomeDiaSemana", "_dia_semana")
+def _build_nome_dia_semana(dia_semana):
+    return _NOMES_DIAS[dia_semana - 1]
+
+
+@_column("NomeMes", "_civil")
+def _build_nome_mes(civil):
+    return _NOMES_MESES[civil[1] - 1]
+
+
+@_column("AnoMes", "_civil")
+def _build_ano_mes(civil):
+    # Rótulos só para os meses distintos, depois indexação
+    ano, mes, _ = civil
+    mes_abs = ano * 12 + (mes - 1)
+    if not len(mes_abs):
+        return np.array([], dtype=object)
+    primeiro = int(mes_abs.min())
+    rotulos = np.array(
+        [
+            f"{m // 12:04d}-{m % 12 + 1:02d}"
+            for m in range(primeiro, int(mes_abs.max()) + 1)
+        ],
+        dtype=object,
+    )
+    return rotulos[mes_abs - primeiro]
+
+
+@_column("Trimestre", "_civil")
+def _build_trimestre(civil):
+    return ((civil[1] - 1) // 3 + 1).astype(np.int32)
+
+
+@_column("Semestre", "_civil")
+def _build_semestre(civil):
+    return np.where(civil[1] <= 6, 1, 2).astype(np.int64)
+
+
+@_column("SemanaAno", "_doy", "_dia_semana")
+def _build_semana_ano(doy, dia_semana):
+    # Semana civil (%U + 1): semanas começando no Domingo
+    return ((doy - 1 + 7 - (dia_semana - 1)) // 7 + 1).astype(np.int64)
+
+
+@_column("SemanaAnoISO", "_civil", "_doy", "_dow")
+def _build_semana_iso(civil, doy, dow):
+    ano = civil[0]
+    semana = (doy - (dow + 1) + 10) // 7
+    semana = np.where(
+        semana < 1,
+        _iso_weeks_in_year(ano - 1),
+        np.where(semana > _iso_weeks_in_year(ano), 1, semana),
+    )
+    return semana.astype(np.int64)
+
+
+@_column("EhFimDeSemana", "_dia_semana")
+def _build_fim_de_semana(dia_semana):
+    return (dia_semana == 1) | (dia_semana == 7)
+
+
+@_column("DataInt", "_civil")
+def _build_data_int(civil):
+    ano, mes, dia = civil
+    return ano * 10000 + mes * 100 + dia
+
+
+@_column("DataEpoch", "_dias")
+def _build_data_epoch(dias):
+    return dias + EXCEL_EPOCH_OFFSET
+
+
+@_column("DataUnixPosix", "_dias")
+def _build_data_unix(dias):
+    return dias * 86400
+
+
+CALENDAR_COLUMNS = [c for c in _COLUMN_BUILDERS if not c.startswith("_")]
+HOLIDAY_TEXT_COLUMNS = ["Feriado", "Feriado Estadual", "Estado"]
+HOLIDAY_FLAG_COLUMNS = ["EhFeriadoNacional", "QtdEstadosFeriado"]
+BUSINESS_DAY_COLUMNS = [
+    "EhDiaUtil",
+    "DiaUtilDoMes",
+    "DiaUtilDoAno",
+    "IndiceDiaUtil",
+    "ProximoDiaUtil",
+    "DiaUtilAnterior",
+]
+# As colunas de dias úteis são opcionais: o padrão mantém o esquema de sempre
+DEFAULT_COLUMNS = ["Data"] + CALENDAR_COLUMNS + HOLIDAY_TEXT_COLUMNS + ["EhFeriado"]
+ALL_COLUMNS = (
+    ["Data"]
+    + CALENDAR_COLUMNS
+    + HOLIDAY_TEXT_COLUMNS
+    + HOLIDAY_FLAG_COLUMNS
+    + ["EhFeriado"]
+    + BUSINESS_DAY_COLUMNS
+)
+
+
+def calendar_columns(
+    dias: np.ndarray, columns: Optional[List[str]] = None
+) -> Dict[str, np.ndarray]:
+    # Colunas de calendário a partir dos dias desde 1970-01-01 (int64)
+    wanted = CALENDAR_COLUMNS if columns is None else columns
+    valores = {"_dias": dias}
+
+    def build(nome):
+        if nome not in valores:
+            deps, fn = _COLUMN_BUILDERS[nome]
+            valores[nome] = fn(*(build(d) for d in deps))
+        return valores[nome]
+
+    return {c: build(c) for c in CALENDAR_COLUMNS if c in wanted}
+
+
+# --- DIAS ÚTEIS ---
+# IndiceDiaUtil conta os dias úteis a partir desta data (1 = primeiro dia útil)
+BUSINESS_DAY_EPOCH = date(1900, 1, 1)
+_WEEKMASK = "1111100"  # Segunda a Sexta
+
+
+def config_key(config: Optional[dict]) -> Tuple:
+    # Chave ausente e chave False são equivalentes: só as opções ligadas contam
+    return tuple(sorted(k for k, v in (config or {}).items() if v))
+
+
+def _to_days(dates) -> np.ndarray:
+    # Aceita date, datetime64, listas, arrays e pd.Series; devolve dias desde 1970
+    if hasattr(dates, "to_numpy"):
+        dates = dates.to_numpy()
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def _year_of(dia: int) -> int:
+    return int(civil_from_days(np.array([dia]))[0][0])
+
+
+@lru_cache(maxsize=32)
+def _business_calendar(
+    first_year: int, last_year: int, options: Tuple, states: Tuple[str, ...]
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    # Máscara de dias úteis (um calendário por combinação de estados) e soma de
+    # prefixos: cum[i] = dias úteis entre BUSINESS_DAY_EPOCH e o dia i, inclusive.
+    config = dict.fromkeys(options, True)
+    first = int(_days_from_civil(np.int64(first_year), 1, 1))
+    last = int(_days_from_civil(np.int64(last_year), 12, 31))
+    dias = np.arange(first, last + 1, dtype=np.int64)
+    util = (dias + 3) % 7 < 5
+    datas, _, _ = holiday_dates(first_year, last_year, config, list(states))
+    datas = datas.astype(np.int64)
+    util[datas[(datas >= first) & (datas <= last)] - first] = False
+
+    # Dias úteis entre a época e o início da janela (negativo se a janela começa antes)
+    epoch = np.datetime64(BUSINESS_DAY_EPOCH, "D")
+    inicio = np.datetime64(first, "D")
+    lo_year, hi_year = sorted((BUSINESS_DAY_EPOCH.year, first_year))
+    feriados, _, _ = holiday_dates(lo_year, hi_year, config, list(states))
+    base = np.busday_count(epoch, inicio, weekmask=_WEEKMASK, holidays=feriados)
+    return first, util, base + np.cumsum(util)
+
+
+def _calendar_for(
+    dias: np.ndarray, pad: int, config: Optional[dict], states: Tuple[str, ...]
+) -> Tuple[int, np.ndarray, np.ndarray]:
+    # Janela em anos inteiros (reaproveitada pelo cache) cobrindo os dias e a folga
+    first_year = _year_of(int(dias.min()) - pad)
+    last_year = _year_of(int(dias.max()) + pad)
+    return _business_calendar(first_year, last_year, config_key(config), states)
+
+
+def business_day_columns(
+    dias: np.ndarray,
+    dia_do_mes: np.ndarray,
+    dia_do_ano: np.ndarray,
+    config: dict,
+    states: List[str],
+) -> Dict[str, np.ndarray]:
+    if not dias.size:
+        vazio = np.array([], dtype=np.int64)
+        datas = vazio.astype("datetime64[ns]")
+        return {
+            "EhDiaUtil": vazio.astype(bool),
+            "DiaUtilDoMes": vazio,
+            "DiaUtilDoAno": vazio,
+            "IndiceDiaUtil": vazio,
+            "ProximoDiaUtil": datas,
+            "DiaUtilAnterior": datas,
+        }
+    first, util, cum = _calendar_for(dias, 31, config, tuple(states))
+    antes = cum - util  # dias úteis estritamente antes de cada dia
+    i = dias - first
+    proximo = np.searchsorted(cum, cum[i] + 1, side="left")
+    anterior = np.searchsorted(cum, antes[i], side="left")
+    return {
+        "EhDiaUtil": util[i],
+        "DiaUtilDoMes": cum[i] - antes[i - (dia_do_mes - 1)],
+        "DiaUtilDoAno": cum[i] - antes[i - (dia_do_ano - 1)],
+        "IndiceDiaUtil": cum[i],
+        "ProximoDiaUtil": (first + proximo)
+        .astype("datetime64[D]")
+        .astype("datetime64[ns]"),
+        "DiaUtilAnterior": (first + anterior)
+        .astype("datetime64[D]")
+        .astype("datetime64[ns]"),
+    }
+
+
+def add_business_days(
+    dates, n, state: Optional[str] = None, config: Optional[dict] = None
+) -> np.ndarray:
+    # Mesma convenção do DIATRABALHO do Excel: a data inicial não conta e n = 0
+    # devolve a própria data. O feriado estadual só vale se state for informado.
+    dias = _to_days(dates)
+    n = np.broadcast_to(np.asarray(n, dtype=np.int64), dias.shape)
+    if not dias.size:
+        return dias.astype("datetime64[D]")
+    pad = 2 * int(np.abs(n).max()) + 31
+    states = (state,) if state else ()
+    first, util, cum = _calendar_for(dias, pad, config, states)
+    i = dias - first
+    alvo = np.where(n > 0, cum[i] + n, cum[i] - util[i] + n + 1)
+    j = np.searchsorted(cum, alvo, side="left")
+    return np.where(n == 0, dias, first + j).astype("datetime64[D]")
+
+
+def business_days_between(
+    a, b, state: Optional[str] = None, config: Optional[dict] = None
+) -> np.ndarray:
+    # Dias úteis em [a, b); se b < a, o resultado é -business_days_between(b, a)
+    dias_a, dias_b = np.broadcast_arrays(_to_days(a), _to_days(b))
+    if not dias_a.size:
+        return np.zeros(dias_a.shape, dtype=np.int64)
+    todos = np.concatenate([dias_a.ravel(), dias_b.ravel()])
+    states = (state,) if state else ()
+    first, util, cum = _calendar_for(todos, 1, config, states)
+    antes = cum - util
+    return antes[dias_b - first] - antes[dias_a - first]
@@ -0,0 +1,424 @@
+"""Serviço HTTP local para a tabela dimensão e consultas pontuais.
+
+Uso: python server.py [--port 8000] [--address 127.0.0.1] [--workers N] [--store DIR]
+
+    GET /dimension?start=2024-01-01&end=2030-12-31&states=SP,RJ&format=csv
+        [&columns=Data,Ano,EhDiaUtil] [&config=incluir_carnaval] [&csv_sep=;]
+        [&filename=dCalendario] [&compact=1]
+    GET /is-business-day?date=2025-03-04[,2025-03-05...][&state=SP][&config=...]
+    GET /holidays?year=2025 | start=2024&end=2026
+        [&states=SP] [&municipalities=3550308] [&config=...] [&national=0]
+
+Listas aceitam vírgulas ou o parâmetro repetido; estados aceitam o nome, a
+sigla ou "todos". csv, json e sql saem em blocos (transferência chunked),
+sem montar a tabela inteira; os demais formatos são gerados uma vez e ficam
+no cache em memória do serviço.
+
+Toda resposta leva um ETag forte calculado só a partir dos parâmetros
+normalizados (e das regras de feriados carregadas): um If-None-Match igual
+responde 304 sem gerar nada.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import date
+from typing import Callable, List, Optional
+
+import numpy as np
+import tornado.web
+from tornado.iostream import StreamClosedError
+
+from app import (
+    ALL_COLUMNS,
+    EXPORT_FORMATS,
+    HOLIDAY_STATES,
+    MUNICIPAL_RULES,
+    NATIONAL,
+    NATIONAL_RULES,
+    STATE_RULES,
+    STREAM_FORMATS,
+    UF_SIGLAS,
+    ResultCache,
+    add_business_days,
+    business_days_between,
+    cached_dimension,
+    cached_export,
+    check_business_day_states,
+    dimension_cache_key,
+    export_file_name,
+    holiday_dates,
+    stream_dimension,
+    use_calendar_store,
+)
+
+SERVICE_VERSION = 1
+MAX_DAYS = 150_000  # ~410 anos por requisição
+MAX_LOOKUPS = 10_000  # datas por consulta em /is-business-day
+FLUSH_BYTES = 256 * 1024
+QUEUE_CHUNKS = 4  # blocos prontos aguardando o cliente (contrapressão)
+ALL_STATES = "todos"
+ALL_COLUMNS_ARG = "todas"
+CACHE_CONTROL = "public, max-age=3600"
+CONFIG_OPTIONS = sorted({r.config for r in NATIONAL_RULES if r.config})
+_SIGLAS_UF = {sigla: nome for nome, sigla in UF_SIGLAS.items()}
+# Municípios aceitos pelo código IBGE ou pelo rótulo "Nome/UF"
+_MUNICIPIOS = set(MUNICIPAL_RULES) | {
+    f"{m.nome}/{m.uf}" for m in MUNICIPAL_RULES.values()
+}
+_FILENAME_RE = re.compile(r"^[\w\-]{1,64}$")
+# Entra em todos os ETags: trocar o arquivo de feriados invalida as respostas
+_RULES_TAG = hashlib.sha256(
+    repr(
+        (NATIONAL_RULES, sorted(STATE_RULES.items()), sorted(MUNICIPAL_RULES.items()))
+    ).encode("utf-8")
+).hexdigest()
+
+
+class _ClientGone(Exception):
+    pass
+
+
+class _LoopSink:
+    # Arquivo só de escrita usado na thread do pool: junta os pedaços pequenos e
+    # entrega ao IOLoop por uma fila limitada, que segura o gerador se o cliente
+    # for mais lento
+    def __init__(self, loop, fila: asyncio.Queue, cancelado: threading.Event):
+        self._loop = loop
+        self._fila = fila
+        self._cancelado = cancelado
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= FLUSH_BYTES:
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        if self._cancelado.is_set():
+            raise _ClientGone()
+        if self._buffer:
+            pedaco = bytes(self._buffer)
+            self._buffer.clear()
+            asyncio.run_coroutine_threadsafe(
+                self._fila.put(pedaco), self._loop
+            ).result()
+
+
+class CalendarHandler(tornado.web.RequestHandler):
+    def initialize(self, executor: Executor, cache: ResultCache):
+        self.executor = executor
+        self.cache = cache
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        exc = kwargs.get("exc_info", (None, None))[1]
+        mensagem = getattr(exc, "log_message", None) or self._reason
+        self.finish({"erro": mensagem})
+
+    def run(self, fn: Callable, *args):
+        # O trabalho de CPU vai para o pool; o IOLoop só atende conexões
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def bad_request(self, mensagem: str) -> tornado.web.HTTPError:
+        return tornado.web.HTTPError(400, mensagem)
+
+    def list_arg(self, name: str) -> List[str]:
+        return [
+            v.strip()
+            for arg in self.get_arguments(name)
+            for v in arg.split(",")
+            if v.strip()
+        ]
+
+    def date_arg(self, name: str) -> date:
+        valor = self.get_argument(name, None)
+        if not valor:
+            raise self.bad_request(f"Parâmetro '{name}' é obrigatório.")
+        return self.parse_date(valor)
+
+    def parse_date(self, valor: str) -> date:
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise self.bad_request(f"Data inválida: {valor}.") from None
+
+    def bool_arg(self, name: str, default: bool) -> bool:
+        valor = self.get_argument(name, None)
+        if valor is None:
+            return default
+        return valor.lower() in ("1", "true", "sim", "s")
+
+    def state_names(self, valores: List[str]) -> List[str]:
+        if valores == [ALL_STATES]:
+            return list(HOLIDAY_STATES)
+        nomes = [_SIGLAS_UF.get(v.upper(), v) for v in valores]
+        invalidos = [v for v, n in zip(valores, nomes) if n not in UF_SIGLAS]
+        if invalidos:
+            raise self.bad_request(f"Estados inválidos: {', '.join(invalidos)}.")
+        return sorted(set(nomes))
+
+    def municipality_keys(self, valores: List[str]) -> List[str]:
+        invalidos = [v for v in valores if v not in _MUNICIPIOS]
+        if invalidos:
+            raise self.bad_request(f"Municípios inválidos: {', '.join(invalidos)}.")
+        return valores
+
+    def config_arg(self) -> dict:
+        opcoes = self.list_arg("config")
+        invalidas = [o for o in opcoes if o not in CONFIG_OPTIONS]
+        if invalidas:
+            raise self.bad_request(f"Opções inválidas: {', '.join(invalidas)}.")
+        return dict.fromkeys(opcoes, True)
+
+    def not_modified(self, *partes) -> bool:
+        # ETag forte a partir dos parâmetros normalizados: nada é gerado para validá-lo
+        chave = repr((SERVICE_VERSION, _RULES_TAG, self.request.path) + partes)
+        etag = hashlib.sha256(chave.encode("utf-8")).hexdigest()[:32]
+        self.set_header("Etag", f'"{etag}"')
+        self.set_header("Cache-Control", CACHE_CONTROL)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return True
+        return False
+
+
+class DimensionHandler(CalendarHandler):
+    async def get(self):
+        start, end = self.date_arg("start"), self.date_arg("end")
+        if start > end:
+            raise self.bad_request("'start' maior que 'end'.")
+        if (end - start).days + 1 > MAX_DAYS:
+            raise self.bad_request(f"Intervalo maior que {MAX_DAYS} dias.")
+        fmt = self.get_argument("format", "csv").lower()
+        if fmt not in EXPORT_FORMATS:
+            raise self.bad_request(f"Formato inválido: {fmt}.")
+        columns = self.list_arg("columns") or None
+        if columns == [ALL_COLUMNS_ARG]:
+            columns = list(ALL_COLUMNS)
+        elif columns is not None:
+            invalidas = [c for c in columns if c not in ALL_COLUMNS]
+            if invalidas:
+                raise self.bad_request(f"Colunas inválidas: {', '.join(invalidas)}.")
+        states = self.state_names(self.list_arg("states"))
+        try:
+            check_business_day_states(columns or [], states)
+        except ValueError as e:
+            raise self.bad_request(str(e)) from None
+        config = self.config_arg()
+        compact = self.bool_arg("compact", False)
+        csv_sep = self.get_argument("csv_sep", ";")
+        if len(csv_sep) != 1:
+            raise self.bad_request("O separador deve ter um caractere.")
+        filename = self.get_argument("filename", "dCalendario")
+        if not _FILENAME_RE.match(filename):
+            raise self.bad_request("Nome de arquivo inválido.")
+
+        dim_key = dimension_cache_key(start, end, config, states, compact, columns)
+        if self.not_modified(dim_key, fmt, csv_sep if fmt == "csv" else None, filename):
+            return
+        nome = export_file_name(filename, fmt)
+        self.set_header("Content-Type", EXPORT_FORMATS[fmt][1])
+        self.set_header("Content-Disposition", f'attachment; filename="{nome}"')
+
+        if fmt in STREAM_FORMATS:
+            await self.stream(
+                lambda sink: stream_dimension(
+                    sink,
+                    fmt,
+                    start,
+                    end,
+                    config,
+                    states,
+                    csv_sep=csv_sep,
+                    table_name=filename,
+                    compact=compact,
+                    columns=columns,
+                )
+            )
+            return
+
+        def exportar() -> bytes:
+            df, _, _ = cached_dimension(
+                self.cache, start, end, config, states, compact, columns
+            )
+            data, _, _ = cached_export(self.cache, dim_key, df, fmt, csv_sep, filename)
+            return data
+
+        data = await self.run(exportar)
+        try:
+            for i in range(0, len(data), FLUSH_BYTES):
+                self.write(data[i : i + FLUSH_BYTES])
+                await self.flush()
+        except StreamClosedError:
+            return
+        self.finish()
+
+    async def stream(self, produzir: Callable) -> None:
+        # produzir(sink) roda no pool; cada pedaço vira um bloco da resposta chunked
+        loop = asyncio.get_running_loop()
+        fila: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+        cancelado = threading.Event()
+        sink = _LoopSink(loop, fila, cancelado)
+
+        def tarefa():
+            produzir(sink)
+            sink.flush()
+
+        trabalho = self.run(tarefa)
+        try:
+            while True:
+                pedaco = asyncio.ensure_future(fila.get())
+                await asyncio.wait(
+                    {pedaco, trabalho}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not pedaco.done():
+                    pedaco.cancel()
+                    break
+                self.write(pedaco.result())
+                await self.flush()
+            # O gerador terminou: entrega o que ficou na fila
+            while not fila.empty():
+                self.write(fila.get_nowait())
+            trabalho.result()  # propaga erros do gerador
+        except StreamClosedError:
+            # Cliente desconectou: libera a fila para o gerador perceber e parar
+            cancelado.set()
+            while not fila.empty():
+                fila.get_nowait()
+            try:
+                await trabalho
+            except _ClientGone:
+                pass
+            return
+        self.finish()
+
+
+class BusinessDayHandler(CalendarHandler):
+    async def get(self):
+        datas = [self.parse_date(v) for v in self.list_arg("date")]
+        if not datas:
+            raise self.bad_request("Parâmetro 'date' é obrigatório.")
+        if len(datas) > MAX_LOOKUPS:
+            raise self.bad_request(f"Máximo de {MAX_LOOKUPS} datas por consulta.")
+        state = self.state_names(self.list_arg("state"))
+        if len(state) > 1:
+            raise self.bad_request("Informe no máximo um estado.")
+        state = state[0] if state else None
+        config = self.config_arg()
+        if self.not_modified(tuple(datas), state, tuple(sorted(config))):
+            return
+
+        def consultar() -> List[dict]:
+            dias = np.array(datas, dtype="datetime64[D]")
+            uteis = business_days_between(dias, dias + 1, state, config) == 1
+            proximos = add_business_days(dias, 1, state, config)
+            anteriores = add_business_days(dias, -1, state, config)
+            return [
+                {
+                    "date": d.isoformat(),
+                    "business_day": bool(u),
+                    "next_business_day": str(p),
+                    "previous_business_day": str(a),
+                }
+                for d, u, p, a in zip(datas, uteis, proximos, anteriores)
+            ]
+
+        self.finish({"state": state, "dates": await self.run(consultar)})
+
+
+class HolidaysHandler(CalendarHandler):
+    async def get(self):
+        try:
+            if self.get_argument("year", None):
+                start_year = end_year = int(self.get_argument("year"))
+            else:
+                start_year = int(self.get_argument("start", date.today().year))
+                end_year = int(self.get_argument("end", start_year))
+        except ValueError:
+            raise self.bad_request("Ano inválido.") from None
+        if start_year > end_year or not 1 <= start_year <= end_year <= 9999:
+            raise self.bad_request("Intervalo de anos inválido.")
+        if (end_year - start_year + 1) * 366 > MAX_DAYS:
+            raise self.bad_request(f"Intervalo maior que {MAX_DAYS} dias.")
+        states = self.state_names(self.list_arg("states"))
+        municipalities = self.municipality_keys(self.list_arg("municipalities"))
+        config = self.config_arg()
+        national = self.bool_arg("national", True)
+        chave = (start_year, end_year, tuple(states), tuple(municipalities))
+        if self.not_modified(*chave, tuple(sorted(config)), national):
+            return
+
+        def consultar() -> List[dict]:
+            datas, nomes, jurisdicoes = holiday_dates(
+                start_year, end_year, config, states, national, municipalities
+            )
+            ordem = np.argsort(datas, kind="stable")
+            return [
+                {"date": str(d), "holiday": h, "jurisdiction": j or NATIONAL}
+                for d, h, j in zip(datas[ordem], nomes[ordem], jurisdicoes[ordem])
+            ]
+
+        self.finish({"holidays": await self.run(consultar)})
+
+
+def make_app(
+    executor: Optional[Executor] = None, cache: Optional[ResultCache] = None
+) -> tornado.web.Application:
+    # Threads: numpy/pandas liberam o GIL nas partes pesadas e o pool pode
+    # entregar os blocos direto ao IOLoop, sem serializar DataFrames
+    opcoes = {
+        "executor": executor or ThreadPoolExecutor(max_workers=os.cpu_count()),
+        "cache": cache or ResultCache(),
+    }
+    return tornado.web.Application(
+        [
+            (r"/dimension", DimensionHandler, opcoes),
+            (r"/is-business-day", BusinessDayHandler, opcoes),
+            (r"/holidays", HolidaysHandler, opcoes),
+        ]
+    )
+
+
+async def serve(port: int, address: str, workers: Optional[int]) -> None:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        app = make_app(executor)
+        app.listen(port, address)
+        print(f"Servindo em http://{address}:{port}")
+        await asyncio.Event().wait()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Serviço HTTP local da tabela dimensão de data."
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--address", default="127.0.0.1", help="Endereço de escuta (padrão: local)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Threads para o trabalho de CPU (padrão: número de CPUs)",
+    )
+    parser.add_argument("--store", help="Usa o armazém pré-calculado desta pasta")
+    args = parser.parse_args(argv)
+
+    if args.store:
+        use_calendar_store(args.store)
+    try:
+        asyncio.run(serve(args.port, args.address, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,65 @@
+import asyncio
+import gzip
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+import tracemalloc
+import zipfile
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import pytest
 import pandas as pd
 import numpy as np
 from datetime import date
-from app import easter_sunday, get_holidays, generate_date_dimension
+import bench
+import cli
+import server
+from tornado.testing import AsyncHTTPTestCase, gen_test
+from app import (
+    ALL_COLUMNS,
+    BUSINESS_DAY_COLUMNS,
+    HOLIDAY_STATES,
+    STATE_RULES,
+    ResultCache,
+    add_business_days,
+    build_calendar_store,
+    business_days_between,
+    cached_dimension,
+    cached_export,
+    calendar_columns,
+    easter_sundays,
+    enrich,
+    holiday_dates,
+    easter_sunday,
+    get_holidays,
+    get_municipal_holidays,
+    load_holiday_rules,
+    generate_date_dimension,
+    export_dataframe,
+    export_delta,
+    export_file_name,
+    dimension_cache_key,
+    generate_holiday_bridge,
+    iter_date_dimension,
+    iter_postgres_copy_script,
+    iter_sql_script,
+    iter_upsert_script,
+    plan_increment,
+    profiling,
+    stage,
+    read_dimension,
+    stream_dimension,
+    to_csv_bytes,
+    to_xlsx_bytes,
+    use_calendar_store,
+    validate_calendar_store,
+    to_json_bytes,
+    to_sql_script,
+    to_upsert_script,
+)
 
 # --- TESTE 1: CÁLCULO DA PÁSCOA ---
 @pytest.mark.parametrize("year, expected", [
@@ -70,4 +127,1049 @@ def test_dataframe_integrity():
 def test_national_movable_holidays():
     # Natal sempre 25/12
     df = generate_date_dimension(date(2024, 12, 25), date(2024, 12, 25), {}, [])
-    assert df.loc[0, "Feriado"] == "Natal"
\ No newline at end of file
+    assert df.loc[0, "Feriado"] == "Natal"
+
+
+# --- TESTE 8: SCRIPT SQL EM LOTES ---
+def test_sql_script_batches():
+    df = generate_date_dimension(date(2024, 7, 1), date(2024, 7, 10), {}, ["São Paulo"])
+    chunks = list(iter_sql_script(df, "dCalendario", batch_size=4))
+
+    # CREATE TABLE + 3 lotes (4 + 4 + 2 linhas)
+    assert len(chunks) == 4
+    assert all(isinstance(c, bytes) for c in chunks)
+    script = to_sql_script(df, batch_size=4).decode("utf-8")
+    assert script == b"".join(chunks).decode("utf-8")
+    assert script.count("INSERT INTO dCalendario") == 3
+    assert "('2024-07-09', 2024, 7, 9," in script
+    assert "'Revolução Constitucionalista', 'São Paulo', TRUE)" in script
+    assert "NULL" in script
+
+
+def test_sql_script_escapes_quotes():
+    df = pd.DataFrame({"Data": pd.to_datetime(["2024-01-01"]), "Nome": ["D'Ávila"]})
+    script = to_sql_script(df).decode("utf-8")
+    assert "('2024-01-01', 'D''Ávila');" in script
+
+
+def _first_chunks_peak(iterador, n=3):
+    tracemalloc.start()
+    try:
+        for _ in zip(range(n), iterador):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize(
+    "script", [iter_sql_script, iter_upsert_script, iter_postgres_copy_script]
+)
+def test_sql_scripts_format_one_batch_at_a_time(script):
+    # O pico para entregar os primeiros lotes não cresce com o tamanho da tabela
+    todos = ["São Paulo", "Bahia", "Rio de Janeiro"]
+    curta = generate_date_dimension(date(2020, 1, 1), date(2022, 12, 31), {}, todos)
+    longa = generate_date_dimension(date(1900, 1, 1), date(2099, 12, 31), {}, todos)
+    _first_chunks_peak(script(curta, batch_size=200))  # aquece imports e caches
+    pico_curta = _first_chunks_peak(script(curta, batch_size=200))
+    assert _first_chunks_peak(script(longa, batch_size=200)) < 2 * pico_curta
+
+
+# --- TESTE 9: CARGA EM MASSA POR DIALETO ---
+def test_sql_types_per_dialect():
+    df = generate_date_dimension(date(2024, 7, 1), date(2024, 7, 10), {}, ["São Paulo"])
+    script = to_sql_script(df).decode("utf-8")
+    # Colunas numéricas com "Data" no nome não são mais tratadas como DATE
+    assert "DataEpoch INTEGER" in script
+    assert "DataUnixPosix BIGINT" in script
+    assert "Data DATE" in script
+    assert '"Feriado Estadual" VARCHAR(255)' in script
+
+
+@pytest.mark.parametrize(
+    "dialect, int32, int64", [("ansi", "INTEGER", "BIGINT"), ("mysql", "INT", "BIGINT")]
+)
+def test_sql_integer_types_do_not_depend_on_range(dialect, int32, int64):
+    # Um intervalo curto declara os tipos largos: cargas posteriores (IndiceDiaUtil
+    # passa de 32767 em 2028, DataUnixPosix de 2**31 em 2038) cabem na tabela
+    df = generate_date_dimension(
+        date(2024, 1, 1), date(2025, 12, 31), {}, [], columns=ALL_COLUMNS
+    )
+    script = to_sql_script(df, dialect=dialect).decode("utf-8")
+    for coluna in ["IndiceDiaUtil", "DataInt", "DataEpoch"]:
+        assert f"{coluna} {int32}," in script
+    assert f"DataUnixPosix {int64}," in script
+    assert "Ano SMALLINT," in script
+    # O modo compacto (int8/int16/int32) declara a mesma tabela
+    compacto = generate_date_dimension(
+        date(2024, 1, 1), date(2024, 1, 2), {}, [], compact=True, columns=ALL_COLUMNS
+    )
+    ddl = to_sql_script(compacto, dialect=dialect).decode("utf-8").split(";")[0]
+    assert ddl == script.split(";")[0]
+
+
+def test_postgres_copy_script():
+    df = generate_date_dimension(date(2024, 7, 8), date(2024, 7, 10), {}, ["São Paulo"])
+    data, mime = export_dataframe(df, "postgres", ";", "dCalendario")
+    script = data.decode("utf-8")
+    assert "COPY dCalendario (" in script
+    assert script.endswith("\\.\n")
+    assert "\tRevolução Constitucionalista\tSão Paulo\tt\n" in script
+    assert "\\N" in script
+
+
+def test_sqlite_database_file(tmp_path):
+    df = generate_date_dimension(date(2024, 7, 1), date(2024, 7, 10), {}, ["São Paulo"])
+    data, _ = export_dataframe(df, "sqlite", ";", "dCalendario")
+    db = tmp_path / "dCalendario.db"
+    db.write_bytes(data)
+    con = sqlite3.connect(db)
+    assert con.execute("SELECT COUNT(*) FROM dCalendario").fetchone()[0] == 10
+    row = con.execute(
+        'SELECT Estado, EhFeriado FROM dCalendario WHERE Data = "2024-07-09"'
+    ).fetchone()
+    con.close()
+    assert row == ("São Paulo", 1)
+
+
+def test_mysql_load_data_bundle():
+    df = generate_date_dimension(date(2024, 7, 1), date(2024, 7, 10), {}, [])
+    data, mime = export_dataframe(df, "mysql", ";", "dCalendario")
+    assert mime == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(data))
+    assert sorted(zf.namelist()) == ["dCalendario.sql", "dCalendario.tsv"]
+    assert (
+        "LOAD DATA LOCAL INFILE 'dCalendario.tsv'"
+        in zf.read("dCalendario.sql").decode()
+    )
+    assert len(zf.read("dCalendario.tsv").decode().splitlines()) == 10
+
+
+# --- TESTE 10: PARQUET E ARROW ---
+def test_parquet_export(tmp_path):
+    df = generate_date_dimension(
+        date(2024, 1, 1), date(2024, 12, 31), {}, ["São Paulo"]
+    )
+    data, _ = export_dataframe(df, "parquet", ";", "dCalendario", compression="zstd")
+    arquivo = tmp_path / "dCalendario.parquet"
+    arquivo.write_bytes(data)
+    table = pq.read_table(arquivo)
+
+    assert table.num_rows == 366
+    assert table.schema.field("Data").type == pa.date32()
+    assert pa.types.is_dictionary(table.schema.field("NomeMes").type)
+    assert pa.types.is_dictionary(table.schema.field("Estado").type)
+    assert table.column("Data")[0].as_py() == date(2024, 1, 1)
+
+
+def test_arrow_export(tmp_path):
+    df = generate_date_dimension(date(2024, 1, 2), date(2024, 1, 3), {}, [])
+    data, mime = export_dataframe(df, "arrow", ";", "dCalendario", compression="lz4")
+    arquivo = tmp_path / "dCalendario.arrow"
+    arquivo.write_bytes(data)
+    table = feather.read_table(arquivo)
+
+    assert mime == "application/vnd.apache.arrow.file"
+    assert table.num_rows == 2
+    # Sem feriados no período: a coluna continua tipada como texto
+    assert table.schema.field("Feriado").type.value_type == pa.string()
+
+
+def test_invalid_parquet_codec():
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 1, 1), {}, [])
+    with pytest.raises(ValueError):
+        export_dataframe(df, "parquet", ";", "dCalendario", compression="rar")
+
+
+# --- TESTE 11: MODO COMPACTO ---
+def test_compact_dtypes():
+    start, end = date(2024, 1, 1), date(2024, 12, 31)
+    normal = generate_date_dimension(start, end, {}, ["São Paulo"])
+    df = generate_date_dimension(start, end, {}, ["São Paulo"], compact=True)
+
+    assert df["Ano"].dtype == "int16"
+    assert df["Mes"].dtype == "int8"
+    assert df["DataInt"].dtype == "int32"
+    assert df["NomeMes"].dtype == "category"
+    assert df["Estado"].dtype == "category"
+    assert df["EhFeriado"].dtype == "boolean"
+    mem = df.attrs["bytes_por_linha"]
+    assert mem["depois"] < mem["antes"]
+    # Mesmos valores, apenas tipos menores
+    pd.testing.assert_frame_equal(
+        df.astype(normal.dtypes.to_dict()), normal, check_dtype=False
+    )
+
+
+# --- TESTE 12: MOTOR ARITMÉTICO DE COLUNAS ---
+def test_calendar_columns_match_pandas():
+    datas = pd.Series(pd.date_range("1890-01-01", "2110-12-31", freq="D"))
+    dias = datas.to_numpy().astype("datetime64[D]").astype(np.int64)
+    cols = calendar_columns(dias)
+
+    np.testing.assert_array_equal(cols["Ano"], datas.dt.year)
+    np.testing.assert_array_equal(cols["DiaDoAno"], datas.dt.dayofyear)
+    np.testing.assert_array_equal(
+        cols["DataInt"], datas.dt.strftime("%Y%m%d").astype(int)
+    )
+    np.testing.assert_array_equal(
+        cols["SemanaAno"], datas.dt.strftime("%U").astype(int) + 1
+    )
+    np.testing.assert_array_equal(cols["SemanaAnoISO"], datas.dt.isocalendar().week)
+    np.testing.assert_array_equal(cols["AnoMes"], datas.dt.to_period("M").astype(str))
+
+
+# --- TESTE 13: PROJEÇÃO DE COLUNAS ---
+def test_column_projection():
+    start, end = date(2024, 7, 1), date(2024, 7, 10)
+    df = generate_date_dimension(
+        start, end, {}, ["São Paulo"], columns=["DataInt", "NomeMes", "Data"]
+    )
+    # Ordem canônica das colunas, independente da ordem pedida
+    assert df.columns.tolist() == ["Data", "NomeMes", "DataInt"]
+    assert df["DataInt"].tolist()[0] == 20240701
+
+    df = generate_date_dimension(start, end, {}, ["São Paulo"], columns=["Estado"])
+    assert df.columns.tolist() == ["Estado"]
+    assert df["Estado"].tolist()[8] == "São Paulo"
+
+
+def test_column_projection_invalid():
+    with pytest.raises(ValueError):
+        generate_date_dimension(
+            date(2024, 1, 1), date(2024, 1, 1), {}, [], columns=["Inexistente"]
+        )
+
+
+# --- TESTE 14: FERIADOS VETORIZADOS ---
+def test_easter_sundays_vectorized():
+    years = np.arange(1900, 2101)
+    esperado = [np.datetime64(easter_sunday(int(y))) for y in years]
+    np.testing.assert_array_equal(
+        easter_sundays(years), np.array(esperado, dtype="datetime64[D]")
+    )
+
+
+def test_holiday_dates_range():
+    config = {"incluir_carnaval": True}
+    datas, nomes, estados = holiday_dates(2024, 2025, config, ["Rio de Janeiro"])
+
+    assert datas.dtype == np.dtype("datetime64[D]")
+    # 13 nacionais + 3 do RJ por ano
+    assert len(datas) == 2 * (13 + 3)
+    carnaval_rj = datas[
+        (nomes == "Carnaval (Feriado RJ)") & (estados == "Rio de Janeiro")
+    ]
+    np.testing.assert_array_equal(
+        carnaval_rj, np.array(["2024-02-13", "2025-03-04"], dtype="datetime64[D]")
+    )
+    assert set(estados[nomes == "Natal"]) == {None}
+
+
+# --- TESTE 15: TABELA PONTE DE FERIADOS ---
+def test_holiday_bridge_table():
+    start, end = date(2024, 1, 1), date(2024, 12, 31)
+    states = ["Amapá", "Ceará", "São Paulo"]
+    df = generate_date_dimension(start, end, {}, states, holiday_bridge=True)
+    bridge = generate_holiday_bridge(start, end, {}, states)
+
+    assert "Feriado" not in df.columns and "Estado" not in df.columns
+    # 19/03 (São José) é feriado no Amapá e no Ceará
+    dia = df[df["DataInt"] == 20240319].iloc[0]
+    assert dia["QtdEstadosFeriado"] == 2
+    assert not dia["EhFeriadoNacional"]
+    assert dia["EhFeriado"]
+    assert df.loc[df["DataInt"] == 20241225, "EhFeriadoNacional"].iloc[0]
+
+    assert bridge.columns.tolist() == ["DataInt", "UF", "Feriado", "Escopo"]
+    linhas = bridge[bridge["DataInt"] == 20240319]
+    assert sorted(linhas["UF"]) == ["AP", "CE"]
+    assert set(linhas["Escopo"]) == {"Estadual"}
+    assert bridge.loc[bridge["Feriado"] == "Natal", "UF"].tolist() == ["BR"]
+
+
+def test_holiday_bridge_exports():
+    start, end = date(2024, 7, 1), date(2024, 7, 31)
+    df = generate_date_dimension(start, end, {}, ["São Paulo"], holiday_bridge=True)
+    bridge = generate_holiday_bridge(start, end, {}, ["São Paulo"])
+
+    data, mime = export_dataframe(df, "csv", ";", "dCalendario", bridge=bridge)
+    assert mime == "application/zip"
+    nomes = zipfile.ZipFile(io.BytesIO(data)).namelist()
+    assert nomes == ["dCalendario.csv", "dCalendario_Feriados.csv"]
+
+    script, _ = export_dataframe(df, "sql", ";", "dCalendario", bridge=bridge)
+    assert b"CREATE TABLE dCalendario_Feriados" in script
+
+    xlsx, _ = export_dataframe(df, "xlsx", ";", "dCalendario", bridge=bridge)
+    workbook = zipfile.ZipFile(io.BytesIO(xlsx)).read("xl/workbook.xml").decode()
+    assert 'name="dCalendario"' in workbook
+    assert 'name="dCalendario_Feriados"' in workbook
+
+
+# --- TESTE 16: DIAS ÚTEIS ---
+def test_business_day_columns():
+    df = generate_date_dimension(
+        date(2024, 7, 1), date(2024, 7, 31), {}, ["São Paulo"], columns=ALL_COLUMNS
+    )
+    dia = df.set_index("DataInt")
+
+    # 09/07 é feriado em SP; 06 e 07/07 são fim de semana
+    assert not dia.loc[20240709, "EhDiaUtil"]
+    assert dia.loc[20240708, "ProximoDiaUtil"] == pd.Timestamp("2024-07-10")
+    assert dia.loc[20240708, "DiaUtilAnterior"] == pd.Timestamp("2024-07-05")
+    assert dia.loc[20240706, "ProximoDiaUtil"] == pd.Timestamp("2024-07-08")
+    assert dia.loc[20240701, "DiaUtilDoMes"] == 1
+    assert dia.loc[20240731, "DiaUtilDoMes"] == 22
+    # Índice contínuo: a diferença conta os dias úteis do intervalo
+    assert dia.loc[20240731, "IndiceDiaUtil"] - dia.loc[20240701, "IndiceDiaUtil"] == 21
+
+
+def test_business_day_index_is_absolute():
+    uteis = ["Data", "IndiceDiaUtil"]
+    curto = generate_date_dimension(
+        date(2024, 7, 1), date(2024, 7, 31), {}, [], columns=uteis
+    )
+    longo = generate_date_dimension(
+        date(2020, 1, 1), date(2025, 12, 31), {}, [], columns=uteis
+    )
+    junto = curto.merge(longo, on="Data")
+    assert (junto["IndiceDiaUtil_x"] == junto["IndiceDiaUtil_y"]).all()
+
+
+def test_business_day_columns_are_opt_in_and_single_state():
+    args = (date(2024, 7, 1), date(2024, 7, 31), {})
+    padrao = generate_date_dimension(*args, ["São Paulo"])
+    assert not set(BUSINESS_DAY_COLUMNS) & set(padrao.columns)
+    # Com dois Estados, o feriado de um deles não vale como dia não útil do outro
+    with pytest.raises(ValueError, match="no máximo um Estado"):
+        generate_date_dimension(*args, ["São Paulo", "Bahia"], columns=ALL_COLUMNS)
+    bahia = generate_date_dimension(*args, ["Bahia"], columns=ALL_COLUMNS)
+    assert bahia.set_index("DataInt").loc[20240709, "EhDiaUtil"]
+    # No lote, split_states dá um calendário por Estado
+    job = {"start": "2024-01-01", "end": "2024-12-31", "states": "todos"}
+    job["columns"] = ["Data", "EhDiaUtil"]
+    with pytest.raises(ValueError, match="Job 1"):
+        cli.expand_jobs({"jobs": [job]})
+    assert len(cli.expand_jobs({"jobs": [{**job, "split_states": True}]})) > 1
+
+
+def test_empty_range_returns_empty_dimension():
+    # start > end devolve a tabela vazia, com as mesmas colunas e tipos
+    args = ({}, ["Bahia"])
+    um_dia = generate_date_dimension(
+        date(2024, 1, 1), date(2024, 1, 1), *args, columns=ALL_COLUMNS
+    )
+    vazia = generate_date_dimension(
+        date(2024, 1, 2), date(2024, 1, 1), *args, columns=ALL_COLUMNS
+    )
+    assert vazia.empty
+    pd.testing.assert_series_equal(vazia.dtypes, um_dia.dtypes)
+
+
+def test_add_business_days_and_between():
+    datas = np.array(["2024-07-08", "2024-07-06", "2024-07-10"], dtype="datetime64[D]")
+    np.testing.assert_array_equal(
+        add_business_days(datas, 1, state="São Paulo"),
+        np.array(["2024-07-10", "2024-07-08", "2024-07-11"], dtype="datetime64[D]"),
+    )
+    np.testing.assert_array_equal(
+        add_business_days(datas, -1),
+        np.array(["2024-07-05", "2024-07-05", "2024-07-09"], dtype="datetime64[D]"),
+    )
+    assert business_days_between(date(2024, 7, 1), date(2024, 8, 1), "São Paulo") == 22
+    assert business_days_between(date(2024, 7, 1), date(2024, 8, 1)) == 23
+    assert business_days_between(date(2024, 8, 1), date(2024, 7, 1)) == -23
+
+
+# --- TESTE 17: ENRIQUECIMENTO DE TABELAS FATO ---
+def test_enrich_matches_merge():
+    rng = np.random.default_rng(42)
+    datas = np.datetime64("2023-01-01") + rng.integers(0, 730, 5000)
+    fato = pd.DataFrame({"Data": datas.astype("datetime64[ns]")})
+    colunas = ["Data", "DataInt", "NomeMes", "Feriado Estadual", "EhDiaUtil"]
+
+    dim = generate_date_dimension(
+        date(2023, 1, 1), date(2024, 12, 31), {}, ["Bahia"], columns=colunas
+    )
+    esperado = fato.merge(dim, on="Data", how="left")
+    obtido = enrich(fato["Data"], colunas, states=["Bahia"], chunk_size=777)
+    pd.testing.assert_frame_equal(obtido, esperado[colunas])
+
+
+def test_enrich_nulls_and_arrow():
+    datas = pa.array([date(2024, 12, 25), None, date(2024, 7, 9)], type=pa.date32())
+    df = enrich(datas, ["DataInt", "Feriado"], chunk_size=2)
+    assert df["Feriado"].tolist()[0] == "Natal"
+    assert pd.isna(df["DataInt"].iloc[1])
+    assert df["DataInt"].iloc[2] == 20240709
+
+
+# --- TESTE 18: FERIADOS NACIONAIS COINCIDENTES ---
+def test_coinciding_national_holidays_single_row():
+    # Em 2000, a Sexta-feira Santa caiu em 21/04 (Tiradentes)
+    df = generate_date_dimension(date(2000, 4, 20), date(2000, 4, 22), {}, [])
+    assert len(df) == 3
+    assert df["Feriado"].iloc[1] == "Tiradentes / Paixão de Cristo"
+
+
+# --- TESTE 19: GERAÇÃO E GRAVAÇÃO EM BLOCOS ---
+def test_iter_date_dimension_chunks_cover_range():
+    inicio, fim = date(2019, 11, 15), date(2022, 2, 3)
+    blocos = list(iter_date_dimension(inicio, fim, {}, ["Bahia"]))
+    assert [b["Ano"].iloc[0] for b in blocos] == [2019, 2020, 2021, 2022]
+    completo = generate_date_dimension(inicio, fim, {}, ["Bahia"])
+    juntos = pd.concat(blocos, ignore_index=True)
+    pd.testing.assert_frame_equal(juntos, completo)
+
+
+@pytest.mark.parametrize("chunk", ["year", "month", 100])
+def test_stream_dimension_matches_full_export(chunk):
+    inicio, fim = date(2023, 6, 1), date(2025, 3, 31)
+    completo = generate_date_dimension(inicio, fim, {}, ["São Paulo"])
+    for fmt, esperado in [
+        ("csv", to_csv_bytes(completo)),
+        ("json", to_json_bytes(completo)),
+    ]:
+        sink = io.BytesIO()
+        stream_dimension(sink, fmt, inicio, fim, {}, ["São Paulo"], chunk=chunk)
+        assert sink.getvalue() == esperado
+
+    sink = io.BytesIO()
+    stream_dimension(sink, "sql", inicio, fim, {}, ["São Paulo"], chunk=chunk)
+    con = sqlite3.connect(":memory:")
+    con.executescript(sink.getvalue().decode("utf-8"))
+    assert con.execute('SELECT COUNT(*) FROM "dCalendario"').fetchone()[0] == len(
+        completo
+    )
+
+
+# --- TESTE 20: COMPRESSÃO DOS FORMATOS DE TEXTO ---
+@pytest.mark.parametrize("fmt", ["csv", "json", "sql", "postgres"])
+def test_gzip_text_export_roundtrip(fmt):
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 12, 31), {}, ["Bahia"])
+    plano, _ = export_dataframe(df, fmt, ";", "dCalendario")
+    data, mime = export_dataframe(df, fmt, ";", "dCalendario", compression="gzip")
+    assert mime == "application/gzip"
+    assert gzip.decompress(data) == plano
+    assert len(data) < len(plano)
+    assert export_file_name("dCalendario", fmt, compression="gzip").endswith(".gz")
+
+
+def test_zip_text_export_with_bridge():
+    inicio, fim = date(2024, 1, 1), date(2024, 12, 31)
+    df = generate_date_dimension(inicio, fim, {}, ["Bahia"], holiday_bridge=True)
+    ponte = generate_holiday_bridge(inicio, fim, {}, ["Bahia"])
+    data, mime = export_dataframe(
+        df, "csv", ";", "dCalendario", compression="zip", bridge=ponte
+    )
+    assert mime == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["dCalendario.csv", "dCalendario_Feriados.csv"]
+        assert zf.read("dCalendario.csv") == to_csv_bytes(df)
+    assert export_file_name("dCalendario", "sql", True, "zip") == "dCalendario.zip"
+
+
+def test_zstd_text_export():
+    zstandard = pytest.importorskip("zstandard")
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 3, 31), {}, [])
+    data, mime = export_dataframe(df, "json", ";", "dCalendario", compression="zstd")
+    assert mime == "application/zstd"
+    leitor = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+    assert leitor.read() == to_json_bytes(df)
+
+
+def test_invalid_text_codec():
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 1, 1), {}, [])
+    with pytest.raises(ValueError):
+        export_dataframe(df, "csv", ";", "dCalendario", compression="rar")
+
+
+# --- TESTE 21: XLSX TIPADO EM MEMÓRIA CONSTANTE ---
+def test_xlsx_native_types_table_and_pane():
+    df = generate_date_dimension(
+        date(2024, 1, 1), date(2024, 1, 3), {}, [], columns=["Data", "Ano", "EhFeriado"]
+    )
+    with zipfile.ZipFile(io.BytesIO(to_xlsx_bytes(df))) as zf:
+        planilha = zf.read("xl/worksheets/sheet1.xml").decode()
+        tabela = zf.read("xl/tables/table1.xml").decode()
+        estilos = zf.read("xl/styles.xml").decode()
+    assert 'state="frozen"' in planilha
+    assert '<c r="A1" t="inlineStr">' in planilha  # cabeçalho sem o formato de data
+    assert '<c r="A2" s="1"><v>45292</v></c>' in planilha  # 2024-01-01 como data
+    assert '<c r="C2" t="b"><v>1</v></c>' in planilha
+    assert 'name="dCalendario"' in tabela and 'ref="A1:C4"' in tabela
+    assert "dd/mm/yyyy" in estilos
+
+
+def test_xlsx_fails_if_table_is_refused(monkeypatch):
+    # Se o xlsxwriter recusar a Tabela, a exportação falha em vez de sair sem ela
+    from xlsxwriter.worksheet import Worksheet
+
+    monkeypatch.setattr(Worksheet, "add_table", lambda self, *args: -3)
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 1, 3), {}, [])
+    with pytest.raises(RuntimeError, match="Tabela"):
+        to_xlsx_bytes(df)
+
+
+def test_xlsx_splits_sheets_above_row_limit():
+    df = generate_date_dimension(
+        date(2024, 1, 1), date(2024, 1, 10), {}, [], columns=["Data", "DataInt"]
+    )
+    with zipfile.ZipFile(io.BytesIO(to_xlsx_bytes(df, max_rows=5))) as zf:
+        workbook = zf.read("xl/workbook.xml").decode()
+        ultima = zf.read("xl/worksheets/sheet3.xml").decode()
+    assert 'name="dCalendario_3"' in workbook
+    assert "<v>20240109</v>" in ultima and "<v>20240110</v>" in ultima
+
+
+# --- TESTE 22: CACHE DE RESULTADOS ---
+def test_result_cache_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", 1, 40)
+    cache.put("b", 2, 40)
+    assert cache.get("a") == 1  # "b" passa a ser o menos usado
+    cache.put("c", 3, 40)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.used_bytes == 80
+    cache.put("d", 4, 500)  # maior que o orçamento: não entra
+    assert "d" not in cache and len(cache) == 2
+
+
+def test_dimension_cache_key_is_normalized():
+    a = dimension_cache_key(
+        date(2024, 1, 1), date(2024, 12, 31), {"incluir_carnaval": False}, ["SP", "BA"]
+    )
+    b = dimension_cache_key(date(2024, 1, 1), date(2024, 12, 31), {}, ["BA", "SP"])
+    assert a == b
+
+
+def test_cached_dimension_and_export_hits():
+    cache = ResultCache()
+    args = (date(2024, 1, 1), date(2024, 3, 31), {}, ["Bahia"])
+    df, _, hit = cached_dimension(cache, *args)
+    assert not hit
+    df2, _, hit = cached_dimension(cache, *args)
+    assert hit and df2 is df
+
+    chave = dimension_cache_key(*args)
+    data, _, hit = cached_export(cache, chave, df, "csv", ";", "dCalendario")
+    assert not hit and data == to_csv_bytes(df)
+    _, _, hit = cached_export(cache, chave, df, "csv", ";", "dCalendario")
+    assert hit
+    _, _, hit = cached_export(cache, chave, df, "csv", ",", "dCalendario")
+    assert not hit
+
+
+# --- TESTE 23: LOTE PELA LINHA DE COMANDO ---
+def test_cli_groups_jobs_that_differ_only_in_format():
+    spec = {
+        "defaults": {"start": "2024-01-01", "end": "2024-12-31"},
+        "jobs": [
+            {"states": ["Bahia", "Acre"], "split_states": True, "format": "csv"},
+            {"states": ["Bahia"], "filename": "dCalendario_BA", "format": "json"},
+            {"states": ["Bahia"], "filename": "dCalendario_BA", "formats": ["sql"]},
+        ],
+    }
+    tasks = cli.expand_jobs(spec)
+    assert len(tasks) == 2
+    assert [e.path.name for e in tasks[0].exports] == [
+        "dCalendario_BA.csv",
+        "dCalendario_BA.json",
+        "dCalendario_BA.sql",
+    ]
+    with pytest.raises(ValueError):
+        cli.expand_jobs(
+            {"jobs": [{"start": "2024-01-01", "end": "2024-01-02", "x": 1}]}
+        )
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cli_batch_writes_files(tmp_path, workers):
+    spec = tmp_path / "lote.toml"
+    spec.write_text(
+        "[defaults]\nstart = 2024-01-01\nend = 2024-03-31\n"
+        '[[jobs]]\nstates = ["São Paulo"]\nformats = ["csv", "parquet"]\n'
+        '[[jobs]]\nfilename = "dCalendario_RJ"\nstates = ["Rio de Janeiro"]\n'
+        'compression = "gzip"\n',
+        encoding="utf-8",
+    )
+    resumo = tmp_path / "resumo.json"
+    saida = tmp_path / "saida"
+    args = [str(spec), "--output-dir", str(saida), "--workers", str(workers)]
+    assert cli.main(args + ["--summary-json", str(resumo)]) == 0
+
+    df = generate_date_dimension(date(2024, 1, 1), date(2024, 3, 31), {}, ["São Paulo"])
+    assert (saida / "dCalendario.csv").read_bytes() == to_csv_bytes(df)
+    assert pq.read_table(saida / "dCalendario.parquet").num_rows == 91
+    assert gzip.decompress((saida / "dCalendario_RJ.csv.gz").read_bytes())
+    assert len(pd.read_json(resumo)) == 3
+
+
+# --- TESTE 24: ARMAZÉM PRÉ-CALCULADO ---
+def test_calendar_store_matches_live(tmp_path):
+    build_calendar_store(tmp_path, date(2000, 1, 1), date(2030, 12, 31))
+    args = (date(2019, 12, 20), date(2021, 1, 10), {"incluir_carnaval": True})
+    estados = ["São Paulo", "Bahia"]
+    colunas = ["Data", "NomeMes", "EhFimDeSemana", "EhFeriado"]
+    vivo = generate_date_dimension(*args, estados, columns=colunas)
+    ponte = generate_date_dimension(*args, estados, holiday_bridge=True)
+    uteis = generate_date_dimension(*args, ["Bahia"], columns=ALL_COLUMNS)
+    try:
+        use_calendar_store(tmp_path)
+        pd.testing.assert_frame_equal(
+            generate_date_dimension(*args, estados, columns=colunas), vivo
+        )
+        pd.testing.assert_frame_equal(
+            generate_date_dimension(*args, estados, holiday_bridge=True), ponte
+        )
+        pd.testing.assert_frame_equal(
+            generate_date_dimension(*args, ["Bahia"], columns=ALL_COLUMNS), uteis
+        )
+        # Fora do intervalo do armazém, volta ao cálculo ao vivo
+        assert (
+            len(generate_date_dimension(date(1999, 12, 1), date(2000, 1, 5), {}, []))
+            == 36
+        )
+    finally:
+        use_calendar_store(None)
+    assert validate_calendar_store(tmp_path, rebuild=False) == []
+
+
+def test_calendar_store_rejects_other_rules(tmp_path, monkeypatch):
+    import app
+
+    build_calendar_store(tmp_path, date(2024, 1, 1), date(2024, 12, 31))
+    monkeypatch.setattr(app, "_rules_fingerprint", lambda: "outras regras")
+    with pytest.raises(ValueError):
+        use_calendar_store(tmp_path)
+
+
+# --- TESTE 25: EXTENSÃO INCREMENTAL ---
+COLUNAS_DELTA = ["Data", "Ano", "Feriado", "Feriado Estadual", "Estado", "EhFeriado"]
+
+
+@pytest.mark.parametrize("ext", ["csv", "parquet", "sql"])
+def test_plan_increment_only_missing_range(tmp_path, ext):
+    velho = generate_date_dimension(
+        date(2024, 1, 1), date(2025, 12, 31), {}, ["São Paulo"], columns=COLUNAS_DELTA
+    )
+    arquivo = tmp_path / f"dCalendario.{ext}"
+    if ext == "csv":
+        arquivo.write_bytes(to_csv_bytes(velho))
+    elif ext == "parquet":
+        velho.to_parquet(arquivo)
+    else:
+        arquivo.write_bytes(to_sql_script(velho, dialect="sqlite"))
+
+    existente = read_dimension(arquivo)
+    plano = plan_increment(date(2026, 12, 31), {}, ["São Paulo"], existing=existente)
+    assert plano.last_date == date(2025, 12, 31)
+    assert len(plano.new_rows) == 365 and plano.changed_rows.empty
+
+    # Um Estado a mais: só as datas dos feriados baianos são reescritas
+    plano = plan_increment(
+        date(2026, 12, 31), {}, ["São Paulo", "Bahia"], existing=existente
+    )
+    assert plano.changed_columns["Estado"] == 2
+    assert plano.changed_rows["Data"].dt.strftime("%m-%d").tolist() == ["07-02"] * 2
+
+
+def test_upsert_script_applies_delta_in_sqlite():
+    estados = ["São Paulo", "Bahia"]
+    velho = generate_date_dimension(
+        date(2024, 1, 1), date(2025, 12, 31), {}, ["São Paulo"], columns=COLUNAS_DELTA
+    )
+    plano = plan_increment(date(2026, 6, 30), {}, estados, existing=velho)
+    script, _, nome = export_delta(plano, "sql", dialect="sqlite")
+    assert nome == "dCalendario_delta.sql"
+
+    con = sqlite3.connect(":memory:")
+    con.executescript(to_sql_script(velho, dialect="sqlite").decode("utf-8"))
+    con.executescript(script.decode("utf-8"))
+    obtido = pd.read_sql_query("SELECT * FROM dCalendario ORDER BY Data", con)
+
+    completo = generate_date_dimension(
+        date(2024, 1, 1), date(2026, 6, 30), {}, estados, columns=COLUNAS_DELTA
+    )
+    con.executescript(to_sql_script(completo, "esperado", dialect="sqlite").decode())
+    esperado = pd.read_sql_query("SELECT * FROM esperado", con)
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def test_csv_delta_is_append_ready():
+    velho = generate_date_dimension(
+        date(2025, 1, 1), date(2025, 12, 31), {}, [], columns=COLUNAS_DELTA
+    )
+    completo = generate_date_dimension(
+        date(2025, 1, 1), date(2026, 12, 31), {}, [], columns=COLUNAS_DELTA
+    )
+    plano = plan_increment(date(2026, 12, 31), {}, [], existing=velho)
+    delta, _, _ = export_delta(plano, "csv")
+    so_data = plan_increment(
+        date(2026, 12, 31), {}, [], last_date=date(2025, 12, 31), columns=COLUNAS_DELTA
+    )
+    assert export_delta(so_data, "csv")[0] == delta
+    assert to_csv_bytes(velho) + delta == to_csv_bytes(completo)
+
+
+def test_plan_increment_rejects_ambiguous_input():
+    velho = generate_date_dimension(
+        date(2025, 1, 1), date(2025, 12, 31), {}, [], columns=COLUNAS_DELTA
+    )
+    with pytest.raises(ValueError, match="vazia"):
+        plan_increment(date(2026, 12, 31), {}, [], existing=velho.iloc[:0])
+    with pytest.raises(ValueError, match="não as duas"):
+        plan_increment(
+            date(2026, 12, 31), {}, [], existing=velho, last_date=date(2025, 6, 30)
+        )
+
+
+def test_upsert_dialects():
+    df = generate_date_dimension(date(2026, 1, 1), date(2026, 1, 2), {}, [])
+    assert b"MERGE INTO dCalendario" in to_upsert_script(df)
+    assert b"ON CONFLICT (Data) DO UPDATE" in to_upsert_script(df, dialect="postgres")
+    assert b"ON DUPLICATE KEY UPDATE" in to_upsert_script(df, dialect="mysql")
+
+
+# --- TESTE 26: REGRAS DE FERIADOS EM ARQUIVO ---
+REGRAS_TESTE = """
+versao = 1
+[nacional]
+regras = [
+  { nome = "Natal", data = "12-25" },
+  { nome = "Consciência Negra", data = "11-20", desde = 2024 },
+  { nome = "Carnaval (Terça)", pascoa = -47, opcao = "incluir_carnaval" },
+]
+[estados."Rio de Janeiro"]
+regras = [{ nome = "Dia do Comércio", mes = 10, dia_semana = "segunda", ordem = 3 }]
+[municipios.3304557]
+nome = "Rio de Janeiro"
+uf = "RJ"
+regras = [{ nome = "Último sábado de fevereiro", mes = 2, dia_semana = "sábado", ordem = -1, ate = 2024 }]
+"""
+
+
+def test_holiday_rules_file_types_and_validity(tmp_path, monkeypatch):
+    import core
+
+    arquivo = tmp_path / "feriados.toml"
+    arquivo.write_text(REGRAS_TESTE, encoding="utf-8")
+    monkeypatch.setattr(core, "HOLIDAY_RULES", load_holiday_rules(arquivo))
+
+    nomes = lambda ano: holiday_dates(ano, ano)[1].tolist()
+    assert nomes(2023) == ["Natal"]
+    assert nomes(2024) == ["Natal", "Consciência Negra"]
+
+    datas, _, estados = holiday_dates(
+        2024, 2025, states=["Rio de Janeiro"], include_national=False
+    )
+    assert datas.astype(str).tolist() == ["2024-10-21", "2025-10-20"]
+    assert estados.tolist() == ["Rio de Janeiro"] * 2
+
+    # Município pelo código IBGE ou pelo rótulo; "ate" encerra a vigência
+    assert get_municipal_holidays(2024, ["3304557"])[0]["date"] == date(2024, 2, 24)
+    assert get_municipal_holidays(2024, ["Rio de Janeiro/RJ"])[0]["Municipio"] == (
+        "Rio de Janeiro/RJ"
+    )
+    assert get_municipal_holidays(2025, ["3304557"]) == []
+
+
+@pytest.mark.parametrize(
+    "regra",
+    [
+        '{ nome = "X", data = "02-30" }',
+        '{ nome = "X", data = "01-01", pascoa = 1 }',
+        '{ nome = "X", pascoa = -120 }',
+        '{ nome = "X", pascoa = 300 }',
+        '{ nome = "X", mes = 5, dia_semana = "segunda", ordem = 5 }',
+        '{ nome = "X", data = "01-01", desde = 2030, ate = 2020 }',
+        '{ nome = "X", data = "01-01", cor = "azul" }',
+    ],
+)
+def test_holiday_rules_file_validation(tmp_path, regra):
+    arquivo = tmp_path / "feriados.toml"
+    arquivo.write_text(f"versao = 1\n[nacional]\nregras = [{regra}]\n")
+    with pytest.raises(ValueError):
+        load_holiday_rules(arquivo)
+
+
+def test_all_states_come_from_the_rules_file():
+    # "todos" na interface, no lote, no serviço e no benchmark é a mesma lista
+    assert set(HOLIDAY_STATES) == set(STATE_RULES)
+    assert cli._job_states("todos") == HOLIDAY_STATES
+    assert bench.bench_states("todos") == HOLIDAY_STATES
+
+
+def test_bundled_municipal_rules():
+    feriados = get_municipal_holidays(2025, ["3550308", "2611606"])
+    assert {f["holiday"] for f in feriados} >= {"Aniversário de São Paulo"}
+    assert all(f["Municipio"] in ("São Paulo/SP", "Recife/PE") for f in feriados)
+
+
+# --- TESTE 27: SERVIÇO HTTP ---
+class TestServidor(AsyncHTTPTestCase):
+    def get_app(self):
+        return server.make_app()
+
+    def test_dimension_csv_streamed_with_etag(self):
+        url = "/dimension?start=2023-01-01&end=2025-12-31&states=SP,RJ&config=incluir_carnaval"
+        resposta = self.fetch(url)
+        assert resposta.code == 200
+        esperado = generate_date_dimension(
+            date(2023, 1, 1),
+            date(2025, 12, 31),
+            {"incluir_carnaval": True},
+            ["Rio de Janeiro", "São Paulo"],
+        )
+        assert resposta.body == to_csv_bytes(esperado)
+        assert resposta.headers["Transfer-Encoding"] == "chunked"
+        etag = resposta.headers["Etag"]
+
+        # Mesmos parâmetros em outra ordem/forma: mesmo ETag e 304 sem corpo
+        outra = "/dimension?end=2025-12-31&start=2023-01-01&states=Rio de Janeiro&states=sp&config=incluir_carnaval"
+        nao_mudou = self.fetch(
+            outra.replace(" ", "%20"), headers={"If-None-Match": etag}
+        )
+        assert nao_mudou.code == 304 and nao_mudou.body == b""
+        assert self.fetch(url + "&csv_sep=,").headers["Etag"] != etag
+
+    def test_dimension_buffered_format(self):
+        resposta = self.fetch(
+            "/dimension?start=2024-01-01&end=2024-03-31&format=parquet&columns=Data,EhDiaUtil"
+        )
+        assert resposta.code == 200
+        df = pq.read_table(io.BytesIO(resposta.body)).to_pandas()
+        assert list(df.columns) == ["Data", "EhDiaUtil"] and len(df) == 91
+        assert (
+            'filename="dCalendario.parquet"' in resposta.headers["Content-Disposition"]
+        )
+
+    def test_point_lookups(self):
+        resposta = self.fetch(
+            "/is-business-day?date=2025-03-04,2025-07-09&state=SP&config=incluir_carnaval"
+        )
+        datas = json.loads(resposta.body)["dates"]
+        assert [d["business_day"] for d in datas] == [False, False]
+        assert datas[0]["next_business_day"] == "2025-03-05"
+        assert datas[1]["previous_business_day"] == "2025-07-08"
+
+        resposta = self.fetch(
+            "/holidays?year=2025&states=SP&municipalities=3550308&national=0"
+        )
+        feriados = json.loads(resposta.body)["holidays"]
+        assert feriados == [
+            {
+                "date": "2025-01-25",
+                "holiday": "Aniversário de São Paulo",
+                "jurisdiction": "São Paulo/SP",
+            },
+            {
+                "date": "2025-07-09",
+                "holiday": "Revolução Constitucionalista",
+                "jurisdiction": "São Paulo",
+            },
+        ]
+
+    def test_invalid_parameters(self):
+        for url in [
+            "/dimension?start=2024-01-01",
+            "/dimension?start=2024-01-01&end=2024-01-31&format=pdf",
+            "/dimension?start=2024-01-01&end=2024-01-31&states=XX",
+            "/dimension?start=2024-01-01&end=2024-01-31&columns=Nada",
+            "/dimension?start=2024-01-01&end=2024-01-31&states=SP,BA&columns=EhDiaUtil",
+            "/is-business-day?date=2024-02-30",
+            "/holidays?year=abc",
+            "/holidays?year=2025&municipalities=9999999",
+        ]:
+            resposta = self.fetch(url)
+            assert resposta.code == 400, url
+            assert "erro" in json.loads(resposta.body)
+        # O município também é aceito pelo rótulo "Nome/UF"
+        resposta = self.fetch("/holidays?year=2025&municipalities=Recife/PE")
+        assert resposta.code == 200
+
+    @gen_test(timeout=30)
+    async def test_concurrent_requests(self):
+        urls = [
+            self.get_url(
+                f"/dimension?start={ano}-01-01&end={ano + 4}-12-31&format=json"
+            )
+            for ano in range(2000, 2030, 5)
+        ]
+        respostas = await asyncio.gather(*(self.http_client.fetch(u) for u in urls))
+        for ano, resposta in zip(range(2000, 2030, 5), respostas):
+            registros = json.loads(resposta.body)
+            assert len(registros) == (date(ano + 5, 1, 1) - date(ano, 1, 1)).days
+
+
+# --- TESTE 28: TEMPO DE IMPORTAÇÃO ---
+# Orçamento para "import core" (numpy incluso), com folga para máquinas lentas
+CORE_IMPORT_BUDGET_MS = 250
+
+
+def _import_times(modulo: str) -> dict:
+    # Tempo acumulado (µs) de cada módulo importado, via python -X importtime
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    tempos = {}
+    for linha in saida.splitlines():
+        partes = linha.split("|")
+        if linha.startswith("import time:") and partes[1].strip().isdigit():
+            tempos[partes[2].strip()] = int(partes[1])
+    return tempos
+
+
+def test_core_import_budget():
+    tempos = _import_times("core")
+    assert not {"pandas", "streamlit", "pyarrow", "xlsxwriter"} & set(tempos)
+    assert tempos["core"] / 1000 < CORE_IMPORT_BUDGET_MS
+
+
+def test_app_imports_ui_and_exporters_lazily():
+    tempos = _import_times("app")
+    assert not {"streamlit", "xlsxwriter", "zstandard"} & set(tempos)
+
+
+# --- TESTE 29: BENCHMARKS ---
+def test_benchmark_runs_every_case():
+    resultados = bench.run_benchmarks(years=[1], states=["0", "todos"], repeat=1)
+    assert [(r.case, r.states) for r in resultados] == [
+        (c, s) for s in ["0", "todos"] for c in bench.CASES
+    ]
+    assert all(r.seconds > 0 and r.rows > 0 for r in resultados)
+    assert all(r.size_bytes > 0 for r in resultados if r.case in bench.EXPORTERS)
+
+
+def test_benchmark_compare_flags_regressions():
+    def caso(case, seconds, peak):
+        return {
+            "case": case,
+            "years": 1,
+            "states": "0",
+            "seconds": seconds,
+            "peak_bytes": peak,
+        }
+
+    base = [caso("csv", 1.0, 1000), caso("json", 0.001, 1000), caso("sql", 1.0, 1000)]
+    atual = [caso("csv", 1.5, 1000), caso("json", 0.003, 1000), caso("sql", 1.1, 2000)]
+    regressoes = bench.compare_results(atual, base, threshold=0.25, min_seconds=0.005)
+    assert len(regressoes) == 2
+    assert regressoes[0].startswith("csv") and "+50%" in regressoes[0]
+    assert regressoes[1].startswith("sql") and "pico" in regressoes[1]
+    # Base zerada com min_seconds=0: regressão sem variação percentual
+    zerada = bench.compare_results(
+        [caso("csv", 0.001, 0)], [caso("csv", 0.0, 0)], min_seconds=0
+    )
+    assert zerada == ["csv 1 anos, estados=0: 0.0000s -> 0.0010s (n/a)"]
+
+
+def test_benchmark_cli_output_and_compare(tmp_path, capsys):
+    saida = tmp_path / "base.json"
+    args = ["--years", "1", "--states", "0", "--cases", "generate,csv", "--repeat", "1"]
+    assert bench.main(args + ["--output", str(saida)]) == 0
+    documento = json.loads(saida.read_text(encoding="utf-8"))
+    assert [r["case"] for r in documento["resultados"]] == ["generate", "csv"]
+
+    assert all(r["peak_bytes"] > 0 for r in documento["resultados"])
+
+    folga = ["--threshold", "100", "--no-memory"]
+    assert bench.main(args + ["--compare", str(saida)] + folga) == 0
+    assert "0 regressões" in capsys.readouterr().out
+
+
+# --- TESTE 30: DESEMPENHO POR ETAPA ---
+def test_profiling_disabled_records_nothing():
+    with profiling(False) as perfil:
+        assert perfil is None
+        with stage("qualquer", 10):
+            pass
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiling_stages_generation_and_export():
+    args = (date(2024, 1, 1), date(2024, 12, 31), {}, ["São Paulo"])
+    with profiling(True) as perfil:
+        df = generate_date_dimension(*args, compact=True)
+        export_dataframe(df, "csv", ";", "dCalendario")
+        export_dataframe(df, "xlsx", ";", "dCalendario")
+    assert not tracemalloc.is_tracing()
+    nomes = [s.name for s in perfil.summary()]
+    assert nomes == [
+        "colunas_calendario",
+        "feriados_nacionais",
+        "feriados_estaduais",
+        "ordenacao",
+        "compactacao",
+        "exportacao_csv",
+        "exportacao_xlsx",
+    ]
+    assert all(s.rows == 366 and s.seconds >= 0 for s in perfil.stages)
+    assert all(s.allocated_bytes > 0 for s in perfil.stages)
+    relatorio = json.loads(perfil.log_line(linhas=len(df)))
+    assert relatorio["linhas"] == 366 and len(relatorio["etapas"]) == len(nomes)
+
+
+def test_profiling_time_only_aggregates_chunks():
+    with profiling(True, trace_memory=False) as perfil:
+        blocos = list(iter_date_dimension(date(2022, 1, 1), date(2024, 12, 31), {}, []))
+    assert len(blocos) == 3
+    calendario = perfil.summary()[0]
+    assert calendario.name == "colunas_calendario" and calendario.rows == 1096
+    assert all(s.allocated_bytes is None for s in perfil.stages)
+
+
+def test_concurrent_profiles_share_tracemalloc():
+    # Duas sessões (threads) medindo ao mesmo tempo: a que sai primeiro não
+    # desliga o rastreamento da outra, e etapas sobrepostas não dão pico alheio
+    import threading
+
+    dentro, saiu = threading.Event(), threading.Event()
+    resultado = {}
+
+    def sessao_longa():
+        with profiling(True) as perfil:
+            with stage("sobreposta"):
+                dentro.set()
+                saiu.wait(10)
+                resultado["rastreando"] = tracemalloc.is_tracing()
+                bytearray(10**6)
+            with stage("sozinha"):
+                bytearray(10**6)
+        resultado["perfil"] = perfil
+
+    t = threading.Thread(target=sessao_longa)
+    with profiling(True) as curto:  # liga o tracemalloc antes da outra sessão
+        t.start()
+        dentro.wait(10)
+        with stage("sobreposta"):
+            bytearray(10**6)
+    saiu.set()
+    t.join(10)
+
+    assert resultado["rastreando"]
+    assert not tracemalloc.is_tracing()
+    assert curto.stages[0].allocated_bytes is None
+    sobreposta, sozinha = resultado["perfil"].stages
+    assert sobreposta.allocated_bytes is None
+    assert sozinha.allocated_bytes >= 10**6
+
+
+def test_cli_profile_logs_json_line(tmp_path, monkeypatch, capsys):
+    import app
+
+    # O --profile grava na variável de ambiente; o monkeypatch a restaura no fim
+    monkeypatch.setenv(app.PROFILE_ENV, "0")
+    spec = tmp_path / "lote.toml"
+    spec.write_text(
+        '[[jobs]]\nstart = 2024-01-01\nend = 2024-01-31\nformats = ["csv", "json"]\n'
+    )
+    args = [str(spec), "--output-dir", str(tmp_path), "--workers", "1"]
+    assert cli.main(args + ["--profile", "tempo"]) == 0
+    linha = json.loads(capsys.readouterr().err.strip())
+    assert linha["evento"] == "desempenho" and len(linha["arquivos"]) == 2
+    assert {"exportacao_csv", "exportacao_json"} <= {e["name"] for e in linha["etapas"]}